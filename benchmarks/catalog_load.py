@@ -0,0 +1,102 @@
+"""Compare loading fonts.json with the binary catalog.
+
+    python3 benchmarks/catalog_load.py --families 1900
+
+Both files are written from the same synthetic records with the
+generator's writers. Each load runs in a fresh interpreter so its time
+and RSS growth are those of a cold start. Needs the generator's deps.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import load_lipi, make_records
+
+
+def get_rss_kib() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def load(kind: str, path: Path):
+    load_lipi()
+    from lipi.catalog import Catalog
+
+    rss_before = get_rss_kib()
+    start = time.perf_counter()
+
+    if kind == "json":
+        records = json.loads(path.read_text())
+        categories = sorted({cat for record in records for cat in record["category"]})
+        subsets = sorted({sub for record in records for sub in record["subsets"]})
+    else:
+        records = Catalog(path)
+        categories, subsets = records.categories, records.subsets
+    opened = time.perf_counter()
+
+    # what building every FontModel reads
+    for record in records:
+        for field in record:
+            record[field]
+    read = time.perf_counter()
+
+    rss_after = get_rss_kib()
+    print(
+        json.dumps(
+            {
+                "open_ms": (opened - start) * 1000,
+                "read_all_ms": (read - start) * 1000,
+                "rss_kib": rss_after - rss_before,
+                "families": len(records),
+                "filters": len(categories) + len(subsets),
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--families", type=int, default=1900)
+    parser.add_argument("--load", nargs=2, metavar=("KIND", "PATH"))
+    args = parser.parse_args()
+
+    if args.load:
+        load(args.load[0], Path(args.load[1]))
+        return
+
+    load_lipi()
+    import generate_fonts_data
+
+    records = make_records(args.families)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = Path(tmp) / "fonts.json"
+        json_path.write_text(json.dumps(records, indent=2, ensure_ascii=False))
+        catalog_path = Path(tmp) / "fonts.bin"
+        generate_fonts_data.write_catalog(records, catalog_path)
+
+        print(f"families: {args.families}")
+        for kind, path in (("json", json_path), ("catalog", catalog_path)):
+            output = subprocess.run(
+                [sys.executable, __file__, "--load", kind, str(path)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output)
+            print(
+                f"{kind:>8}: {path.stat().st_size / 1024:.0f} KiB on disk, "
+                f"open {result['open_ms']:.1f} ms, "
+                f"read all {result['read_all_ms']:.1f} ms, "
+                f"+{result['rss_kib'] / 1024:.1f} MiB RSS"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import importlib.util
+import random
+import sys
+from pathlib import Path
+
+from typing_extensions import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+WORDS = [
+    "Noto",
+    "Sans",
+    "Serif",
+    "Mono",
+    "Display",
+    "Grotesk",
+    "Libre",
+    "Open",
+    "Source",
+    "Code",
+    "Slab",
+    "Script",
+    "Rounded",
+    "Condensed",
+    "Hand",
+    "Playfair",
+    "Baskerville",
+    "Garamond",
+    "Roboto",
+    "Fira",
+    "Space",
+    "Work",
+    "Nunito",
+    "Merri",
+    "Crimson",
+    "Inter",
+    "Lexend",
+    "Archivo",
+    "Bitter",
+    "Cabin",
+]
+DESIGNERS = [
+    "Google",
+    "Christian Robertson",
+    "Indian Type Foundry",
+    "Steve Matteson",
+    "Jan Kovarik",
+    "Rasmus Andersson",
+    "Carrois Apostrophe",
+    "Vernon Adams",
+    "Łukasz Dziedzic",
+    "Sorkin Type",
+]
+CATEGORIES = ["Sans Serif", "Serif", "Display", "Handwriting", "Monospace"]
+SUBSETS = [
+    "latin",
+    "latin-ext",
+    "cyrillic",
+    "cyrillic-ext",
+    "greek",
+    "vietnamese",
+    "devanagari",
+    "arabic",
+    "hebrew",
+    "thai",
+    "japanese",
+    "korean",
+]
+WEIGHTS = ["Thin", "Light", "Regular", "Medium", "SemiBold", "Bold", "Black"]
+
+
+def load_lipi():
+    # The app is installed as the lipi package, load src under that name
+    if "lipi" not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            "lipi",
+            ROOT / "src" / "__init__.py",
+            submodule_search_locations=[str(ROOT / "src")],
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["lipi"] = module
+        spec.loader.exec_module(module)
+
+    # for generate_fonts_data
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+
+
+def make_records(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    # fonts.json like records, with about the spread of the real catalog
+    rng = random.Random(seed)
+    records = []
+
+    for i in range(count):
+        name = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+        family = f"{name} {i}"
+        file_dir = f"https://raw.githubusercontent.com/google/fonts/main/ofl/f{i}"
+        variable = rng.random() < 0.4
+
+        if variable:
+            files = [f"{file_dir}/{name.replace(' ', '')}[wght].ttf"]
+            axes = [{"tag": "wght", "min": 100.0, "max": 900.0}]
+        else:
+            weights = rng.sample(WEIGHTS, rng.randint(1, len(WEIGHTS)))
+            files = [f"{file_dir}/{name.replace(' ', '')}-{w}.ttf" for w in weights]
+            axes = []
+
+        records.append(
+            {
+                "family": family,
+                "display_name": family,
+                "designer": ", ".join(rng.sample(DESIGNERS, rng.randint(1, 2))),
+                "license": rng.choice(["OFL", "APACHE2", "UFL"]),
+                "category": rng.sample(CATEGORIES, rng.randint(1, 2)),
+                "subsets": rng.sample(SUBSETS, rng.randint(1, 5)),
+                "files": files,
+                "hashes": [rng.randbytes(32).hex() for _ in files],
+                "axes": axes,
+                "variable_files": files if variable else [],
+                "preview_string": family,
+                "preview_family": f"{family} Preview",
+            }
+        )
+
+    return records
@@ -0,0 +1,146 @@
+"""Time to the first test face against a local HTTP stand-in for GitHub.
+
+    python3 benchmarks/first_face.py --latency 80 --bandwidth 4
+
+A family of static weights, upright and italic, is served from localhost
+with a delay before every response and a capped transfer rate. Its files
+are fetched with FontLibrary.fetch_test_font_files, which the Test page
+streams its faces from. The time until the regular file is on disk is
+when its face shows up, before the test page waited for every file.
+Needs PyGObject.
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from typing_extensions import Dict, List, Tuple
+
+from common import load_lipi
+
+WEIGHTS = [
+    "Thin",
+    "ExtraLight",
+    "Light",
+    "Regular",
+    "Medium",
+    "SemiBold",
+    "Bold",
+    "ExtraBold",
+    "Black",
+]
+CHUNK_SIZE = 16 * 1024
+
+
+def make_file_names() -> List[str]:
+    names = []
+    for weight in WEIGHTS:
+        names.append(f"Family-{weight}.ttf")
+        names.append(f"Family-{'' if weight == 'Regular' else weight}Italic.ttf")
+    # the order of the catalog, regular isn't near the front
+    return sorted(names)
+
+
+def make_handler(body: bytes, latency: float, bandwidth: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+
+            for start in range(0, len(body), CHUNK_SIZE):
+                self.wfile.write(body[start : start + CHUNK_SIZE])
+                time.sleep(CHUNK_SIZE / bandwidth)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+async def fetch_family(
+    library, base_url: str, names: List[str], cache_dir: Path
+) -> Tuple[float, float]:
+    from lipi.download_cache import DownloadCache
+    from lipi.download_scheduler import DownloadScheduler
+
+    # the client belongs to the event loop of this run
+    library.download_scheduler = DownloadScheduler()
+    library.download_cache = DownloadCache(cache_dir, 1024**3)
+    first_path = library.download_cache.get_path(f"{base_url}/Family-Regular.ttf")
+    done: Dict[Path, float] = {}
+
+    start = time.perf_counter()
+    try:
+        tasks = library.fetch_test_font_files(
+            [f"{base_url}/{name}" for name in names], {}
+        )
+        for task in asyncio.as_completed(tasks):
+            done[await task] = time.perf_counter() - start
+    finally:
+        await library.download_scheduler.client.aclose()
+
+    return done[first_path], max(done.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=80, help="ms per response")
+    parser.add_argument(
+        "--bandwidth", type=float, default=4, help="MiB/s per connection"
+    )
+    parser.add_argument("--file-size", type=int, default=200, help="KiB")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    # keep the user's installed.json, font dir and download cache out of it
+    os.environ["HOME"] = tmp
+    os.environ["XDG_DATA_HOME"] = f"{tmp}/data"
+    os.environ["XDG_CACHE_HOME"] = f"{tmp}/cache"
+
+    load_lipi()
+    from lipi.font_library import FontLibrary
+
+    library = FontLibrary(Path(tmp))
+
+    body = bytes(args.file_size * 1024)
+    handler = make_handler(body, args.latency / 1000, args.bandwidth * 1024**2)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    names = make_file_names()
+    first_times = []
+    all_times = []
+
+    try:
+        for _ in range(args.runs):
+            # a cold cache every run
+            with tempfile.TemporaryDirectory() as cache_dir:
+                first, all_done = asyncio.run(
+                    fetch_family(library, base_url, names, Path(cache_dir))
+                )
+            first_times.append(first * 1000)
+            all_times.append(all_done * 1000)
+    finally:
+        server.shutdown()
+        shutil.rmtree(tmp)
+
+    print(f"files: {len(names)} x {args.file_size} KiB, latency {args.latency} ms")
+    print(f"first face: median {statistics.median(first_times):.0f} ms")
+    print(f"all faces: median {statistics.median(all_times):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
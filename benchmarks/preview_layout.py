@@ -0,0 +1,83 @@
+"""Compare per family preview fonts with preview collections.
+
+    python3 benchmarks/preview_layout.py previews/
+
+Takes a previews directory written by generate_fonts_data.py without
+--collections, packs a copy of it into collections with the generator
+and reports file count, size and the time to register every preview
+font in a Pango font map for both layouts. Needs the generator's deps
+and PyGObject.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import gi
+from typing_extensions import List
+
+gi.require_version("PangoCairo", "1.0")
+from gi.repository import PangoCairo
+
+from common import load_lipi
+
+
+def measure(name: str, files: List[Path]):
+    font_map = PangoCairo.FontMap.new()
+
+    start = time.perf_counter()
+    for path in files:
+        font_map.add_font_file(str(path))
+    # listing the families makes fontconfig scan the added files
+    families = len(font_map.list_families())
+    elapsed = time.perf_counter() - start
+
+    size = sum(path.stat().st_size for path in files)
+    print(
+        f"{name:>12}: {len(files)} files, {size / 1024:.0f} KiB, "
+        f"{families} families loaded in {elapsed * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("previews", type=Path)
+    args = parser.parse_args()
+
+    load_lipi()
+    import generate_fonts_data
+
+    ttf_files = sorted(args.previews.glob("*.ttf"))
+    if not ttf_files:
+        raise SystemExit(f"No per family preview fonts in {args.previews}")
+
+    measure("per family", ttf_files)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp) / generate_fonts_data.OUTPUT_PREVIEWS_PATH
+        output_dir.mkdir()
+        for path in ttf_files:
+            shutil.copy(path, output_dir)
+
+        # the generator writes relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            generate_fonts_data.pack_preview_collections(
+                [path.stem for path in ttf_files]
+            )
+        finally:
+            os.chdir(cwd)
+
+        index = json.loads(
+            (output_dir / generate_fonts_data.OUTPUT_COLLECTIONS_INDEX).read_text()
+        )
+        measure("collections", [output_dir / name for name in index])
+
+
+if __name__ == "__main__":
+    main()
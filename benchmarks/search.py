@@ -0,0 +1,80 @@
+"""Time the search index per keystroke over a synthetic catalog.
+
+    python3 benchmarks/search.py --families 1900
+
+Every query is typed one character at a time and each prefix is matched
+like a keystroke in the search entry, in the filter and the ranked
+(fuzzy) mode. A linear scan with the old filter_func checks is timed
+over the same prefixes for reference.
+"""
+
+import argparse
+import statistics
+import time
+
+from typing_extensions import Any, Callable, Dict, List
+
+from common import load_lipi, make_records
+
+# with typos, for the ranked mode
+QUERIES = ["noto sans", "mono", "garamond", "inter 12", "robto slab", "grotesk", "xyz"]
+FILTERS = [("All", "All"), ("Serif", "All"), ("All", "cyrillic")]
+
+
+def linear_filter(
+    records: List[Dict[str, Any]], query: str, category: str, subset: str
+):
+    query = query.lower()
+    return [
+        record
+        for record in records
+        if (
+            query in record["display_name"].lower() or query in record["family"].lower()
+        )
+        and (category == "All" or category in record["category"])
+        and (subset == "All" or subset in record["subsets"])
+    ]
+
+
+def time_keystrokes(match: Callable[[str, str, str], Any]) -> List[float]:
+    timings = []
+    for category, subset in FILTERS:
+        for query in QUERIES:
+            for end in range(1, len(query) + 1):
+                start = time.perf_counter()
+                match(query[:end], category, subset)
+                timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(name: str, timings: List[float]):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95)]
+    print(
+        f"{name:>8}: median {statistics.median(timings):.3f} ms, "
+        f"p95 {p95:.3f} ms, max {timings[-1]:.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--families", type=int, default=1900)
+    args = parser.parse_args()
+
+    load_lipi()
+    from lipi.search_index import SearchIndex
+
+    records = make_records(args.families)
+
+    start = time.perf_counter()
+    index = SearchIndex(records)
+    print(f"families: {args.families}")
+    print(f"index built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    report("linear", time_keystrokes(lambda *f: linear_filter(records, *f)))
+    report("index", time_keystrokes(lambda *f: index.match(*f, False)))
+    report("ranked", time_keystrokes(lambda *f: index.match(*f, True)))
+
+
+if __name__ == "__main__":
+    main()
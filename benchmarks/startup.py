@@ -0,0 +1,76 @@
+"""Time FontsManager startup against a synthetic system font map.
+
+    python3 benchmarks/startup.py --system-families 5000
+
+Needs PyGObject with Gtk 4. Exits with 1 when fontconfig is listed more
+than once during startup.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from common import load_lipi, make_records
+
+
+class SyntheticFamily:
+    def __init__(self, name: str):
+        self.name = name
+
+    def get_name(self) -> str:
+        return self.name
+
+
+class SyntheticFontMap:
+    def __init__(self, count: int):
+        self.families = [SyntheticFamily(f"System Family {i}") for i in range(count)]
+        self.list_calls = 0
+
+    def list_families(self):
+        self.list_calls += 1
+        return self.families
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--families", type=int, default=1900)
+    parser.add_argument("--system-families", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # keep the user's installed.json and font dir out of it
+        os.environ["HOME"] = tmp
+        os.environ["XDG_DATA_HOME"] = f"{tmp}/data"
+        os.environ["XDG_CACHE_HOME"] = f"{tmp}/cache"
+
+        load_lipi()
+        from lipi import fonts_manager
+
+        data_dir = Path(tmp)
+        (data_dir / "fonts.json").write_text(json.dumps(make_records(args.families)))
+
+        font_map = SyntheticFontMap(args.system_families)
+        with mock.patch.object(
+            fonts_manager.PangoCairo.FontMap, "get_default", return_value=font_map
+        ):
+            start = time.perf_counter()
+            manager = fonts_manager.FontsManager(data_dir)
+            first_batch = time.perf_counter()
+            asyncio.run(manager.populate_font_store())
+            end = time.perf_counter()
+
+    print(f"families: {args.families}, system families: {args.system_families}")
+    print(f"first batch shown: {(first_batch - start) * 1000:.1f} ms")
+    print(f"all fonts loaded: {(end - start) * 1000:.1f} ms")
+    print(f"fontconfig snapshots: {font_map.list_calls}")
+
+    return 0 if font_map.list_calls == 1 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
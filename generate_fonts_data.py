@@ -1,15 +1,19 @@
 # https://googlefonts.github.io/gf-guide/metadata.html
 
 import argparse
+import hashlib
 import json
 import os
-import uuid
+import shutil
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Tuple, TypeVar
 
 import uharfbuzz as hb
-from fontTools.ttLib import TTFont
+from fontTools.ttLib import TTCollection, TTFont
 from gflanguages import LoadLanguages, LoadScripts
 from gftools import fonts_public_pb2
 from google.protobuf import text_format
@@ -21,13 +25,25 @@ LICENSE_FOLDERS = ["ofl", "apache", "ufl"]
 FONT_FILE_BASE_URL = f"https://raw.githubusercontent.com/google/fonts/{GF_COMMIT_SHA}"
 
 OUTPUT_JSON_PATH = "fonts.json"
+OUTPUT_CATALOG_PATH = "fonts.bin"
 OUTPUT_PREVIEWS_PATH = "previews/"
+OUTPUT_COLLECTIONS_INDEX = "collections.json"
+PREVIEWS_PER_COLLECTION = 512
+
+# Subsets are cached across runs, bump the version to invalidate them
+BUILD_CACHE_PATH = ".preview_cache/"
+BUILD_CACHE_MANIFEST = "manifest.json"
+BUILD_CACHE_VERSION = "2"
+CATALOG_VERSION = 3
 
 # https://github.com/googlefonts/lang
 gflanguages = LoadLanguages()
 gfscripts = LoadScripts()
 SCRIPT_NAME_TO_ID = {script.name: code for code, script in gfscripts.items()}
 
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 def get_required_glyph_ids(face: hb.Face, text: str) -> set:  # type: ignore
     font = hb.Font(face)  # type: ignore
@@ -72,34 +88,151 @@ def rename_ttf(font: TTFont, new_name: str):
             record.string = clean_name.encode(record.getEncoding())
 
 
+def generate_preview_file(preview_sample: Tuple[str, Path, str, str]) -> str | None:
+    family, ttf_path, preview_string, build_key = preview_sample
+
+    try:
+        subset_data = generate_subset(ttf_path, preview_string)
+        font = TTFont(subset_data)
+
+        # Assign new names for subsetted fonts so there is no conflict with existing ones in the system with the same name
+        # Named after the build key, so the same inputs always give the same name
+        new_family_name = build_key[:32]
+        rename_ttf(font, new_family_name)
+
+        font.save(Path(BUILD_CACHE_PATH) / f"{new_family_name}.ttf")
+        return new_family_name
+    except Exception as e:
+        print(f"Skipping font subsetting {str(ttf_path)} for '{preview_string}': {e}")
+        return None
+
+
 def generate_preview_files(
-    preview_samples: List[Tuple[str, Path, str]],
-) -> Dict[str, str]:
-    preview_family_map = {}
+    preview_samples: List[Tuple[str, Path, str, str]], jobs: int = 1
+) -> Dict[str, str | None]:
+    Path(BUILD_CACHE_PATH).mkdir(exist_ok=True)
 
-    output_dir = Path(OUTPUT_PREVIEWS_PATH)
-    output_dir.mkdir(exist_ok=True)
+    preview_families = run_jobs(generate_preview_file, preview_samples, jobs)
+
+    return {
+        family: preview_family
+        for (family, _, _, _), preview_family in zip(preview_samples, preview_families)
+    }
+
+
+def get_build_key(
+    metadata_path: Path, sample_file_path: Path, preview_string: str
+) -> str:
+    digest = hashlib.sha256(BUILD_CACHE_VERSION.encode())
+    digest.update(hashlib.sha256(metadata_path.read_bytes()).digest())
+    digest.update(hashlib.sha256(sample_file_path.read_bytes()).digest())
+    digest.update(preview_string.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_build_cache() -> Dict[str, Dict[str, str | None]]:
+    try:
+        return json.loads((Path(BUILD_CACHE_PATH) / BUILD_CACHE_MANIFEST).read_text())
+    except Exception:
+        return {}
 
-    for family, ttf_path, preview_string in preview_samples:
-        try:
-            subset_data = generate_subset(ttf_path, preview_string)
-            font = TTFont(subset_data)
 
-            # Assign new names for subsetted fonts so there is no conflict with existing ones in the system with the same name
-            new_family_name = str(uuid.uuid4())
-            rename_ttf(font, new_family_name)
-            preview_family_map[family] = new_family_name
+def save_build_cache(build_cache: Dict[str, Dict[str, str | None]]) -> None:
+    cache_dir = Path(BUILD_CACHE_PATH)
+    (cache_dir / BUILD_CACHE_MANIFEST).write_text(
+        json.dumps(build_cache, indent=2, sort_keys=True), encoding="utf-8"
+    )
 
-            font.save(output_dir / f"{new_family_name}.ttf")
-        except Exception as e:
-            print(
-                f"Skipping font subsetting {str(ttf_path)} for '{preview_string}': {e}"
+    # drop subsets of families that were rebuilt or removed upstream
+    referenced = {entry["preview_family"] for entry in build_cache.values()}
+    for path in cache_dir.glob("*.ttf"):
+        if path.stem not in referenced:
+            path.unlink()
+
+
+def generate_preview_files_incremental(
+    preview_samples: List[Tuple[str, Path, str, str]], jobs: int = 1
+) -> Dict[str, str | None]:
+    started = time.perf_counter()
+    build_cache = load_build_cache()
+    cache_dir = Path(BUILD_CACHE_PATH)
+
+    preview_family_map: Dict[str, str | None] = {}
+    changed_samples = []
+
+    for preview_sample in preview_samples:
+        family, _, _, build_key = preview_sample
+        cached = build_cache.get(family)
+        if (
+            cached
+            and cached["key"] == build_key
+            and (
+                cached["preview_family"] is None
+                or (cache_dir / f"{cached['preview_family']}.ttf").exists()
             )
-            preview_family_map[family] = None
+        ):
+            preview_family_map[family] = cached["preview_family"]
+        else:
+            changed_samples.append(preview_sample)
+
+    preview_family_map.update(generate_preview_files(changed_samples, jobs))
+
+    save_build_cache(
+        {
+            family: {"key": build_key, "preview_family": preview_family_map[family]}
+            for family, _, _, build_key in preview_samples
+        }
+    )
+
+    print(
+        f"Preview subsets: {len(preview_samples) - len(changed_samples)} reused, "
+        f"{len(changed_samples)} rebuilt in {time.perf_counter() - started:.1f}s."
+    )
 
     return preview_family_map
 
 
+def pack_preview_collections(preview_families: List[str]) -> None:
+    output_dir = Path(OUTPUT_PREVIEWS_PATH)
+    index: Dict[str, List[Dict[str, Any]]] = {}
+    sizes_before = 0
+
+    for start in range(0, len(preview_families), PREVIEWS_PER_COLLECTION):
+        chunk = preview_families[start : start + PREVIEWS_PER_COLLECTION]
+        ttf_paths = [output_dir / f"{name}.ttf" for name in chunk]
+        sizes_before += sum(path.stat().st_size for path in ttf_paths)
+
+        collection = TTCollection()
+        collection.fonts = [TTFont(path) for path in ttf_paths]
+
+        collection_name = f"previews-{start // PREVIEWS_PER_COLLECTION}.ttc"
+        collection_path = output_dir / collection_name
+        collection.save(collection_path)
+
+        # ttcf tag, version, numFonts, then one table directory offset per face
+        with open(collection_path, "rb") as f:
+            header = f.read(12 + 4 * len(chunk))
+        offsets = struct.unpack_from(f">{len(chunk)}I", header, 12)
+
+        index[collection_name] = [
+            {"preview_family": name, "index": i, "offset": offset}
+            for i, (name, offset) in enumerate(zip(chunk, offsets))
+        ]
+
+        for path in ttf_paths:
+            path.unlink()
+
+    (output_dir / OUTPUT_COLLECTIONS_INDEX).write_text(
+        json.dumps(index, indent=2), encoding="utf-8"
+    )
+
+    sizes_after = sum((output_dir / name).stat().st_size for name in index)
+    print(
+        f"Packed {len(preview_families)} preview fonts into {len(index)} collections "
+        f"({sizes_before // 1024} KiB -> {sizes_after // 1024} KiB)."
+    )
+
+
 def load_metadata(path: Path) -> Dict[Any, Any]:
     message = fonts_public_pb2.FamilyProto()  # type: ignore
     text_format.Parse(path.read_text(), message, allow_unknown_field=True)
@@ -176,6 +309,34 @@ def get_best_preview_string(metadata) -> str:
     )
 
 
+def get_variable_files(
+    font_files: List[Dict[str, Any]], axes: List[Dict[str, Any]], family_dir: Path
+) -> List[str]:
+    # Variable files are named after their axes, like Roboto[wdth,wght].ttf
+    variable = [font for font in font_files if "[" in font["filename"]]
+    if not axes or not variable:
+        return []
+
+    weight_axis = next((axis for axis in axes if axis["tag"] == "wght"), None)
+    variable_styles = {font["style"] for font in variable}
+    variable_weights = {font["weight"] for font in variable}
+
+    # Only worth preferring when they can stand in for every static file
+    for font in font_files:
+        if font["style"] not in variable_styles:
+            return []
+        if weight_axis:
+            if not weight_axis["min"] <= font["weight"] <= weight_axis["max"]:
+                return []
+        elif font["weight"] not in variable_weights:
+            return []
+
+    return [
+        f"{FONT_FILE_BASE_URL}/{family_dir.parent.name}/{family_dir.name}/{file_name}"
+        for file_name in dict.fromkeys(font["filename"] for font in variable)
+    ]
+
+
 def parse_metadata(metadata_path: Path) -> Tuple[Dict[str, str], Path, str]:
     metadata = load_metadata(metadata_path)
     family_dir = metadata_path.parent
@@ -193,6 +354,13 @@ def parse_metadata(metadata_path: Path) -> Tuple[Dict[str, str], Path, str]:
 
     sample_file_path = family_dir / sample_file
 
+    # Files can be listed once per style, each is downloaded once
+    file_names = list(dict.fromkeys(font["filename"] for font in font_files))
+    axes = [
+        {"tag": axis["tag"], "min": axis["min_value"], "max": axis["max_value"]}
+        for axis in metadata.get("axes", [])
+    ]
+
     metadata_out = {
         "family": metadata["name"],
         "display_name": metadata.get("display_name", metadata["name"]),
@@ -205,41 +373,160 @@ def parse_metadata(metadata_path: Path) -> Tuple[Dict[str, str], Path, str]:
             if sub != "menu"
         ],
         "files": [
-            f"{FONT_FILE_BASE_URL}/{family_dir.parent.name}/{family_dir.name}/{font['filename']}"
-            for font in font_files
+            f"{FONT_FILE_BASE_URL}/{family_dir.parent.name}/{family_dir.name}/{file_name}"
+            for file_name in file_names
         ],
+        # lets the app verify downloads
+        "hashes": [
+            hashlib.sha256((family_dir / file_name).read_bytes()).hexdigest()
+            for file_name in file_names
+        ],
+        "axes": axes,
+        "variable_files": get_variable_files(font_files, axes, family_dir),
         "preview_string": preview_string,
     }
 
     return metadata_out, sample_file_path, preview_string
 
 
-def main(google_fonts_path: Path) -> None:
+def write_catalog(metadatas: List[Dict[str, Any]], path: Path) -> None:
+    # Binary layout read by src/catalog.py, keep both in sync
+    # header | string offsets | category ids | subset ids | records | small ids | file ids | file hashes | file flags | axes | strings
+    strings: Dict[str, int] = {}
+
+    def intern(string: str) -> int:
+        return strings.setdefault(string, len(strings))
+
+    categories = sorted({cat for f in metadatas for cat in f["category"]})
+    subsets = sorted({sub for f in metadatas for sub in f["subsets"]})
+    category_ids = {cat: i for i, cat in enumerate(categories)}
+    subset_ids = {sub: i for i, sub in enumerate(subsets)}
+
+    category_strings = [intern(cat) for cat in categories]
+    subset_strings = [intern(sub) for sub in subsets]
+
+    records = []
+    small_ids: List[int] = []
+    file_ids: List[int] = []
+    file_hashes = bytearray()
+    file_flags = bytearray()
+    axes: List[Tuple[int, float, float]] = []
+
+    for f in metadatas:
+        cat_start = len(small_ids)
+        small_ids.extend(category_ids[cat] for cat in f["category"])
+        sub_start = len(small_ids)
+        small_ids.extend(subset_ids[sub] for sub in f["subsets"])
+        file_start = len(file_ids)
+        file_ids.extend(intern(url) for url in f["files"])
+        for file_hash in f.get("hashes") or [""] * len(f["files"]):
+            # sha256 digests, zeroed when unknown
+            file_hashes += bytes.fromhex(file_hash) if file_hash else bytes(32)
+        variable_files = set(f.get("variable_files", []))
+        # bit 0, the file is used instead of the rest when preferring variable fonts
+        file_flags.extend(1 if url in variable_files else 0 for url in f["files"])
+        axis_start = len(axes)
+        axes.extend(
+            (intern(axis["tag"]), axis["min"], axis["max"])
+            for axis in f.get("axes", [])
+        )
+
+        records.append(
+            (
+                intern(f["family"]),
+                intern(f["display_name"]),
+                intern(f["designer"]),
+                intern(f["license"]),
+                intern(f["preview_string"]),
+                intern(f["preview_family"]),
+                cat_start,
+                len(f["category"]),
+                sub_start,
+                len(f["subsets"]),
+                file_start,
+                len(f["files"]),
+                axis_start,
+                len(axes) - axis_start,
+            )
+        )
+
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+
+    with open(path, "wb") as out:
+        out.write(
+            struct.pack(
+                "<4sH2x7I",
+                b"LIPI",
+                CATALOG_VERSION,
+                len(encoded),
+                len(records),
+                len(categories),
+                len(subsets),
+                len(small_ids),
+                len(file_ids),
+                len(axes),
+            )
+        )
+        out.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        out.write(struct.pack(f"<{len(category_strings)}I", *category_strings))
+        out.write(struct.pack(f"<{len(subset_strings)}I", *subset_strings))
+        for record in records:
+            out.write(struct.pack("<14I", *record))
+        out.write(struct.pack(f"<{len(small_ids)}H", *small_ids))
+        out.write(struct.pack(f"<{len(file_ids)}I", *file_ids))
+        out.write(file_hashes)
+        out.write(file_flags)
+        for axis in axes:
+            out.write(struct.pack("<I2f", *axis))
+        out.write(b"".join(encoded))
+
+
+def try_parse_metadata(
+    metadata_path: Path,
+) -> Tuple[Dict[str, str], Path, str, str] | None:
+    try:
+        family_data, sample_file_path, preview_string = parse_metadata(metadata_path)
+        build_key = get_build_key(metadata_path, sample_file_path, preview_string)
+        return family_data, sample_file_path, preview_string, build_key
+    except Exception as e:
+        print(f"Skipping metadata extraction {str(metadata_path)}: {e}")
+        return None
+
+
+def run_jobs(fn: Callable[[T], R], items: List[T], jobs: int) -> List[R]:
+    # Results keep the order of items, so the output doesn't depend on the worker count
+    if jobs <= 1:
+        return [fn(item) for item in items]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(fn, items, chunksize=16))
+
+
+def main(google_fonts_path: Path, collections: bool = False, jobs: int = 1) -> None:
     metadatas = []
-    metadatas_total = 0
     preview_samples = []
 
-    for folder in LICENSE_FOLDERS:
-        license_path = google_fonts_path / folder
-        if not license_path.exists():
+    metadata_paths = sorted(
+        metadata_path
+        for folder in LICENSE_FOLDERS
+        for metadata_path in (google_fonts_path / folder).glob("*/METADATA.pb")
+    )
+    metadatas_total = len(metadata_paths)
+
+    for parsed in run_jobs(try_parse_metadata, metadata_paths, jobs):
+        if parsed is None:
             continue
 
-        for metadata_path in license_path.glob("*/METADATA.pb"):
-            try:
-                family_data, sample_file_path, preview_string = parse_metadata(
-                    metadata_path
-                )
-                metadatas.append(family_data)
-                preview_samples.append(
-                    (family_data["family"], sample_file_path, preview_string)
-                )
-            except Exception as e:
-                print(f"Skipping metadata extraction {str(metadata_path)}: {e}")
-                continue
-            finally:
-                metadatas_total += 1
-
-    preview_family_map = generate_preview_files(preview_samples)
+        family_data, sample_file_path, preview_string, build_key = parsed
+        metadatas.append(family_data)
+        preview_samples.append(
+            (family_data["family"], sample_file_path, preview_string, build_key)
+        )
+
+    preview_family_map = generate_preview_files_incremental(preview_samples, jobs)
 
     for metadata in metadatas:
         metadata["preview_family"] = preview_family_map[metadata["family"]]
@@ -249,10 +536,22 @@ def main(google_fonts_path: Path) -> None:
 
     metadatas.sort(key=lambda f: f["display_name"].lower())
 
+    output_dir = Path(OUTPUT_PREVIEWS_PATH)
+    output_dir.mkdir(exist_ok=True)
+    for metadata in metadatas:
+        preview_file = f"{metadata['preview_family']}.ttf"
+        shutil.copyfile(
+            Path(BUILD_CACHE_PATH) / preview_file, output_dir / preview_file
+        )
+
+    if collections:
+        pack_preview_collections([f["preview_family"] for f in metadatas])
+
     Path(OUTPUT_JSON_PATH).write_text(
         json.dumps(metadatas, indent=2, ensure_ascii=False),
         encoding="utf-8",
     )
+    write_catalog(metadatas, Path(OUTPUT_CATALOG_PATH))
 
     print(f"\nDone! Indexed {len(metadatas)} out of {metadatas_total} families.")
 
@@ -266,5 +565,17 @@ if __name__ == "__main__":
         type=Path,
         help="Path to the root of the google fonts repository",
     )
+    parser.add_argument(
+        "--collections",
+        action="store_true",
+        help="Pack preview fonts into a few TrueType Collection files",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes for metadata parsing and subsetting",
+    )
     args = parser.parse_args()
-    main(args.google_fonts_path)
+    main(args.google_fonts_path, args.collections, args.jobs)
@@ -0,0 +1,228 @@
+import mmap
+import struct
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+
+from typing_extensions import Any, Callable, Dict, Iterator, List, Tuple
+
+# Keep in sync with write_catalog in generate_fonts_data.py
+MAGIC = b"LIPI"
+VERSION = 3
+
+HASH_SIZE = 32
+# file flags
+FILE_VARIABLE = 1
+
+HEADER = struct.Struct("<4sH2x7I")
+RECORD = struct.Struct("<14I")
+AXIS = struct.Struct("<I2f")
+
+FIELDS = (
+    "family",
+    "display_name",
+    "designer",
+    "license",
+    "category",
+    "subsets",
+    "files",
+    "hashes",
+    "axes",
+    "variable_files",
+    "preview_string",
+    "preview_family",
+)
+
+
+class CatalogRecord(Mapping):
+    """One family of the catalog, each field is decoded on first access."""
+
+    def __init__(self, catalog: "Catalog", row: Tuple[int, ...]):
+        self.catalog = catalog
+        self.row = row
+        self.fields: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return self.fields[key]
+        except KeyError:
+            pass
+
+        decode = self.catalog.decoders.get(key)
+        if decode is None:
+            raise KeyError(key)
+
+        value = self.fields[key] = decode(self.row)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+
+class Catalog(Sequence):
+    """Read-only view of the binary font catalog written by generate_fonts_data.py.
+
+    Strings are stored once in a shared table and decoded lazily, so
+    repeated values (designers, licenses, url prefixes) share one object.
+    Categories and subsets are stored as small ids into their own tables.
+    Records are unpacked from the mapped file when they are indexed, and
+    their fields when they are read, so close the catalog only once every
+    record in use has been read.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self.read_header(path)
+        except Exception:
+            self.buffer.close()
+            raise
+
+        self.decoders: Dict[str, Callable[[Tuple[int, ...]], Any]] = {
+            field: getattr(self, f"decode_{field}") for field in FIELDS
+        }
+
+    def read_header(self, path: Path):
+        (
+            magic,
+            version,
+            string_count,
+            record_count,
+            category_count,
+            subset_count,
+            small_ids_count,
+            file_ids_count,
+            axis_count,
+        ) = HEADER.unpack_from(self.buffer, 0)
+
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a font catalog")
+        if version != VERSION:
+            raise ValueError(f"Unsupported font catalog version {version}")
+
+        offset = HEADER.size
+        self.string_offsets = struct.unpack_from(
+            f"<{string_count + 1}I", self.buffer, offset
+        )
+        offset += 4 * (string_count + 1)
+
+        category_ids = struct.unpack_from(f"<{category_count}I", self.buffer, offset)
+        offset += 4 * category_count
+        subset_ids = struct.unpack_from(f"<{subset_count}I", self.buffer, offset)
+        offset += 4 * subset_count
+
+        self.records_offset = offset
+        self.record_count = record_count
+        offset += RECORD.size * record_count
+
+        self.small_ids = struct.unpack_from(f"<{small_ids_count}H", self.buffer, offset)
+        offset += 2 * small_ids_count
+        self.file_ids = struct.unpack_from(f"<{file_ids_count}I", self.buffer, offset)
+        offset += 4 * file_ids_count
+        self.file_hashes_offset = offset
+        offset += HASH_SIZE * file_ids_count
+        self.file_flags = self.buffer[offset : offset + file_ids_count]
+        offset += file_ids_count
+        self.axes = list(
+            AXIS.iter_unpack(self.buffer[offset : offset + AXIS.size * axis_count])
+        )
+        offset += AXIS.size * axis_count
+
+        self.strings_offset = offset
+        self.strings: List[str | None] = [None] * string_count
+
+        self.categories = [self.get_string(i) for i in category_ids]
+        self.subsets = [self.get_string(i) for i in subset_ids]
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def get_string(self, index: int) -> str:
+        string = self.strings[index]
+        if string is None:
+            start = self.strings_offset + self.string_offsets[index]
+            end = self.strings_offset + self.string_offsets[index + 1]
+            string = self.strings[index] = self.buffer[start:end].decode("utf-8")
+        return string
+
+    def get_file_hash(self, index: int) -> str:
+        start = self.file_hashes_offset + HASH_SIZE * index
+        digest = self.buffer[start : start + HASH_SIZE]
+        return digest.hex() if any(digest) else ""
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.record_count))]
+
+        if index < 0:
+            index += self.record_count
+        if not 0 <= index < self.record_count:
+            raise IndexError("catalog index out of range")
+
+        row = RECORD.unpack_from(self.buffer, self.records_offset + RECORD.size * index)
+        return CatalogRecord(self, row)
+
+    # Decoders take a record row: family, display name, designer, license,
+    # preview string, preview family, then start and count pairs for the
+    # categories, subsets, files and axes
+    def decode_family(self, row: Tuple[int, ...]) -> str:
+        return self.get_string(row[0])
+
+    def decode_display_name(self, row: Tuple[int, ...]) -> str:
+        return self.get_string(row[1])
+
+    def decode_designer(self, row: Tuple[int, ...]) -> str:
+        return self.get_string(row[2])
+
+    def decode_license(self, row: Tuple[int, ...]) -> str:
+        return self.get_string(row[3])
+
+    def decode_preview_string(self, row: Tuple[int, ...]) -> str:
+        return self.get_string(row[4])
+
+    def decode_preview_family(self, row: Tuple[int, ...]) -> str:
+        return self.get_string(row[5])
+
+    def decode_category(self, row: Tuple[int, ...]) -> List[str]:
+        start, count = row[6:8]
+        return [self.categories[i] for i in self.small_ids[start : start + count]]
+
+    def decode_subsets(self, row: Tuple[int, ...]) -> List[str]:
+        start, count = row[8:10]
+        return [self.subsets[i] for i in self.small_ids[start : start + count]]
+
+    def decode_files(self, row: Tuple[int, ...]) -> List[str]:
+        start, count = row[10:12]
+        return [self.get_string(i) for i in self.file_ids[start : start + count]]
+
+    def decode_hashes(self, row: Tuple[int, ...]) -> List[str]:
+        start, count = row[10:12]
+        return [self.get_file_hash(i) for i in range(start, start + count)]
+
+    def decode_variable_files(self, row: Tuple[int, ...]) -> List[str]:
+        start, count = row[10:12]
+        return [
+            self.get_string(self.file_ids[i])
+            for i in range(start, start + count)
+            if self.file_flags[i] & FILE_VARIABLE
+        ]
+
+    def decode_axes(self, row: Tuple[int, ...]) -> List[Dict[str, Any]]:
+        start, count = row[12:14]
+        return [
+            {"tag": self.get_string(tag), "min": min_value, "max": max_value}
+            for tag, min_value, max_value in self.axes[start : start + count]
+        ]
@@ -0,0 +1,164 @@
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from typing_extensions import Any, Dict, List, Mapping, Sequence
+
+from .font_library import FontLibrary
+from .font_model import FontModel
+from .search_index import SearchIndex, iter_bits
+
+COMMANDS = ("install", "remove", "list", "search")
+
+
+def is_cli_command(argv: List[str]) -> bool:
+    # Only the first argument, GTK and Gio options may follow anywhere
+    return len(argv) > 1 and argv[1] in COMMANDS
+
+
+def describe(record: Mapping[str, Any], library: FontLibrary) -> Dict[str, Any]:
+    return {
+        "family": record["family"],
+        "display_name": record["display_name"],
+        "designer": record["designer"],
+        "license": record["license"],
+        "category": record["category"],
+        "subsets": record["subsets"],
+        "installed": record["family"] in library.app_installed_fonts,
+    }
+
+
+def get_fonts(
+    library: FontLibrary, records: Sequence[Mapping[str, Any]], families: List[str]
+) -> List[FontModel]:
+    record_map = {record["family"]: record for record in records}
+
+    unknown = [family for family in families if family not in record_map]
+    if unknown:
+        raise Exception(f"Unknown font families: {', '.join(unknown)}")
+
+    return [
+        FontModel(
+            record_map[family],
+            is_app_installed=family in library.app_installed_fonts,
+        )
+        for family in dict.fromkeys(families)
+    ]
+
+
+def run_batch(
+    library: FontLibrary, fonts: List[FontModel], install: bool
+) -> Dict[str, Any]:
+    if install:
+        fonts = [font for font in fonts if not font.is_app_installed]
+        failures = asyncio.run(library.install_fonts(fonts))
+    else:
+        fonts = [font for font in fonts if font.is_app_installed]
+        failures = asyncio.run(library.remove_fonts(fonts))
+
+    result: Dict[str, Any] = {
+        "done": [font.family for font in fonts if font.family not in failures],
+        "failed": {family: str(error) for family, error in failures.items()},
+    }
+    if install:
+        # hits are files already downloaded by the test view or earlier installs
+        result["cache"] = library.download_cache.stats()
+    return result
+
+
+def run_command(
+    options: argparse.Namespace,
+    library: FontLibrary,
+    records: Sequence[Mapping[str, Any]],
+) -> Any:
+    if options.command in ("install", "remove"):
+        library.prefer_variable = getattr(options, "prefer_variable", False)
+        fonts = get_fonts(library, records, options.families)
+        result = run_batch(library, fonts, options.command == "install")
+        # there is no main loop to run the delayed write
+        library.app_installed_fonts.flush()
+        return result
+
+    if options.command == "list":
+        return [
+            describe(record, library)
+            for record in records
+            if not options.installed or record["family"] in library.app_installed_fonts
+        ]
+
+    # Only search needs the index, the other commands skip building it
+    matches, scores = SearchIndex(records).match(
+        options.query, options.category, options.subset, True
+    )
+    positions = sorted(iter_bits(matches), key=lambda pos: (-scores.get(pos, 0), pos))
+    return [describe(records[pos], library) for pos in positions]
+
+
+def main(args: List[str], pkgdatadir: str) -> int:
+    # Given after the command, only the first argument selects the command line
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--data-dir",
+        type=Path,
+        # the font data is installed next to the package data, under the app id
+        default=Path(pkgdatadir).parent / FontLibrary.APP_ID,
+        help="Directory with fonts.bin or fonts.json",
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="lipi", description="Install and search fonts without the GUI."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    install_parser = commands.add_parser(
+        "install", parents=[common], help="Install font families"
+    )
+    install_parser.add_argument("families", nargs="+")
+    install_parser.add_argument(
+        "--prefer-variable",
+        action="store_true",
+        help="Only install variable font files when they cover every style",
+    )
+
+    remove_parser = commands.add_parser(
+        "remove", parents=[common], help="Remove installed families"
+    )
+    remove_parser.add_argument("families", nargs="+")
+
+    list_parser = commands.add_parser(
+        "list", parents=[common], help="List font families"
+    )
+    list_parser.add_argument(
+        "--installed", action="store_true", help="Only fonts installed by Lipi"
+    )
+
+    search_parser = commands.add_parser(
+        "search", parents=[common], help="Search font families"
+    )
+    search_parser.add_argument("query")
+    search_parser.add_argument("--category", default="All")
+    search_parser.add_argument("--subset", default="All")
+
+    options = parser.parse_args(args)
+
+    try:
+        library = FontLibrary(options.data_dir)
+        records, _, _ = library.load_font_data(
+            options.data_dir / "fonts.bin", options.data_dir / "fonts.json"
+        )
+        try:
+            result = run_command(options, library, records)
+        finally:
+            library.close_font_data()
+
+    except Exception as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        return 1
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    if isinstance(result, dict) and result["failed"]:
+        return 1
+    return 0
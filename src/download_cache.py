@@ -0,0 +1,159 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import shutil
+import time
+from pathlib import Path, PurePosixPath
+from urllib.parse import urlparse
+
+from typing_extensions import Awaitable, Callable, Dict, Set
+
+# Unfinished downloads are kept this long for resuming, in seconds
+PARTIAL_MAX_AGE = 24 * 60 * 60
+
+# linux/fs.h, clones the extents of a file on CoW filesystems like btrfs and xfs
+FICLONE = 0x40049409
+
+
+def link_or_copy(source: Path, destination: Path):
+    # A hardlink is free, but only works within a filesystem
+    try:
+        os.link(source, destination)
+        return
+    except OSError:
+        pass
+
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return
+        except OSError:
+            pass
+
+        # In kernel copy, without going through userspace buffers
+        remaining = os.fstat(src.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+            if remaining == 0:
+                return
+        except OSError:
+            pass
+
+        src.seek(0)
+        dst.seek(0)
+        dst.truncate()
+        shutil.copyfileobj(src, dst)
+
+
+class DownloadCache:
+    """Downloaded font files, evicted least recently used first by total size.
+
+    Font file urls are pinned to a google/fonts commit, so a url always
+    refers to the same content and is enough as the cache key.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+
+        # So the same file isn't downloaded twice when test and install overlap
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+        # file name -> pin count, for files in live font maps or being installed
+        self.pins: Dict[str, int] = {}
+
+    def get_path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        suffix = PurePosixPath(urlparse(url).path).suffix
+        return self.cache_dir / f"{key}{suffix}"
+
+    async def fetch(
+        self, url: str, download: Callable[[str, Path], Awaitable[None]]
+    ) -> Path:
+        path = self.get_path(url)
+
+        async with self.locks.setdefault(url, asyncio.Lock()):
+            if path.exists():
+                self.hits += 1
+                # mtime is the recency used for eviction
+                os.utime(path)
+                return path
+
+            self.misses += 1
+            # Left behind when a download fails, so a retry resumes it
+            part_path = path.with_name(f"{path.name}.part")
+            await download(url, part_path)
+            os.replace(part_path, path)
+
+        # the worker gets a copy, pins change on the main loop
+        await asyncio.to_thread(self.evict, set(self.pins))
+        return path
+
+    def pin(self, path: Path):
+        # Pinned files are skipped by evict, Pango reads them lazily and
+        # installs link them once the whole family is downloaded
+        self.pins[path.name] = self.pins.get(path.name, 0) + 1
+
+    def unpin(self, path: Path):
+        count = self.pins.get(path.name, 0) - 1
+        if count > 0:
+            self.pins[path.name] = count
+        else:
+            self.pins.pop(path.name, None)
+
+    def evict(self, pinned: Set[str]):
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file():
+                continue
+
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # moved into place or evicted by another fetch meanwhile
+                continue
+
+            if not entry.name.endswith(".part"):
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            elif now - stat.st_mtime > PARTIAL_MAX_AGE:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if os.path.basename(path) in pinned:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        files = 0
+        size = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or entry.name.endswith(".part"):
+                continue
+            try:
+                size += entry.stat().st_size
+            except FileNotFoundError:
+                continue
+            files += 1
+
+        return {"hits": self.hits, "misses": self.misses, "files": files, "bytes": size}
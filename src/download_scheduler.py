@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import heapq
+import importlib.util
+import itertools
+import random
+from contextlib import asynccontextmanager
+from pathlib import Path
+from urllib.parse import urlparse
+
+import anyio
+import httpx
+from typing_extensions import AsyncIterator, Dict, List, Tuple
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+# The rest of what the user waits on, after the file shown first
+PRIORITY_INTERACTIVE_REST = 1
+PRIORITY_BACKGROUND = 10
+
+# Worth another attempt, the server or something in between is struggling
+RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def get_file_hash(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class PrioritySemaphore:
+    """Semaphore that hands free slots to the highest priority waiter first."""
+
+    def __init__(self, limit: int):
+        self.available = limit
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.counter = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self.available > 0 and not self.waiters:
+            self.available -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.counter), future))
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # the slot was already handed over, pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        # slots go straight to the next waiter instead of back to the pool
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+
+        self.available += 1
+
+
+class DownloadScheduler:
+    """Runs every font download of the app through shared connection limits."""
+
+    MAX_CONCURRENT = 8
+    MAX_PER_HOST = 6
+    MAX_ATTEMPTS = 5
+    # seconds, doubled on every retry
+    RETRY_BASE_DELAY = 0.5
+
+    def __init__(self, client: httpx.AsyncClient | None = None):
+        self.client = client or self.create_client()
+        self.slots = PrioritySemaphore(self.MAX_CONCURRENT)
+        self.host_slots: Dict[str, PrioritySemaphore] = {}
+
+    @classmethod
+    def create_client(cls) -> httpx.AsyncClient:
+        # HTTP/2 needs the optional h2 package, streams are multiplexed over one connection
+        http2 = importlib.util.find_spec("h2") is not None
+
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=cls.MAX_CONCURRENT,
+                max_keepalive_connections=cls.MAX_CONCURRENT,
+                keepalive_expiry=30,
+            ),
+        )
+
+    @asynccontextmanager
+    async def slot(self, url: str, priority: int) -> AsyncIterator[None]:
+        host = urlparse(url).netloc
+        host_slots = self.host_slots.setdefault(
+            host, PrioritySemaphore(self.MAX_PER_HOST)
+        )
+
+        await host_slots.acquire(priority)
+        try:
+            await self.slots.acquire(priority)
+            try:
+                yield
+            finally:
+                self.slots.release()
+        finally:
+            host_slots.release()
+
+    async def download(
+        self, url: str, path: Path, priority: int, sha256: str | None = None
+    ):
+        # path is a partial file, whatever is already in it is resumed from
+        for attempt in range(self.MAX_ATTEMPTS):
+            try:
+                async with self.slot(url, priority):
+                    await self.download_once(url, path, sha256)
+                break
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = (
+                    isinstance(e, httpx.TransportError)
+                    or e.response.status_code in RETRY_STATUS_CODES
+                )
+                if not retryable or attempt == self.MAX_ATTEMPTS - 1:
+                    raise
+
+                # exponential backoff with jitter, so retries don't arrive together
+                delay = self.RETRY_BASE_DELAY * 2**attempt
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+        if sha256:
+            file_hash = await asyncio.to_thread(get_file_hash, path)
+            if file_hash != sha256:
+                path.unlink(missing_ok=True)
+                raise Exception(f"Checksum mismatch for {url}")
+
+    async def download_once(self, url: str, path: Path, sha256: str | None):
+        if await self.request_file(url, path):
+            return
+
+        # The range starts past the end, a crash before the partial file was
+        # moved into place can leave it complete
+        if sha256 and await asyncio.to_thread(get_file_hash, path) == sha256:
+            return
+
+        path.unlink(missing_ok=True)
+        await self.request_file(url, path)
+
+    async def request_file(self, url: str, path: Path) -> bool:
+        # False when the server can't satisfy the range of the partial file
+        offset = path.stat().st_size if path.exists() else 0
+        # Ranges count encoded bytes, a compressed body can't be resumed from
+        # the size of the decoded partial file
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        async with self.client.stream(
+            "GET", url, headers=headers, follow_redirects=True
+        ) as resp:
+            if resp.status_code == 416 and offset:
+                return False
+            resp.raise_for_status()
+
+            # Servers may ignore the range and send the whole file
+            mode = "ab" if resp.status_code == 206 else "wb"
+            async with await anyio.open_file(path, mode) as f:
+                async for chunk in resp.aiter_bytes(chunk_size=256 * 1024):
+                    await f.write(chunk)
+
+        return True
@@ -6,4 +6,7 @@ class Filters(GObject.Object):
     subset = GObject.Property(type=str, default="All")
     search_query = GObject.Property(type=str, default="")
     installed_only = GObject.Property(type=bool, default=False)
+    fuzzy_search = GObject.Property(type=bool, default=False)
     preview_size = GObject.Property(type=int, default=20)
+    preview_atlas = GObject.Property(type=bool, default=False)
+    prefer_variable = GObject.Property(type=bool, default=False)
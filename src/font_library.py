@@ -0,0 +1,287 @@
+import asyncio
+import json
+import shutil
+import tempfile
+import uuid
+from pathlib import Path, PurePosixPath
+from urllib.parse import urlparse
+
+import httpx
+from gi.repository import GLib
+from typing_extensions import Any, Dict, List, Mapping, Sequence, Set, Tuple
+
+from .catalog import Catalog
+from .download_cache import DownloadCache, link_or_copy
+from .download_scheduler import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_INTERACTIVE_REST,
+    DownloadScheduler,
+)
+from .font_model import FontModel
+from .installed_fonts import InstalledFonts
+
+
+def get_file_order(url: str) -> int:
+    # The regular face, or a variable file covering it, is shown first
+    name = PurePosixPath(urlparse(url).path).stem
+    if "Italic" in name:
+        return 2
+    if name.endswith("-Regular") or "[" in name:
+        return 0
+    return 1
+
+
+class FontLibrary:
+    """The font catalog and the fonts installed by the app.
+
+    Nothing here needs a display, so it is shared by the app and the
+    command line.
+    """
+
+    APP_ID = "io.github.shonebinu.Glyph"
+    DATA_DIR = Path(f"/app/share/{APP_ID}")
+    DOWNLOAD_CACHE_SIZE = 512 * 1024 * 1024
+
+    def __init__(self, data_dir: Path = DATA_DIR):
+        self.data_dir = data_dir
+
+        self.user_font_dir = Path("~/.local/share/fonts/").expanduser()
+        self.user_font_dir.mkdir(parents=True, exist_ok=True)
+        self.installed_fonts_json_path = (
+            Path(GLib.get_user_data_dir()) / self.APP_ID / "installed.json"
+        )
+        self.installed_fonts_json_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Only the variable files of a family when they cover all its styles
+        self.prefer_variable = False
+
+        self.download_scheduler = DownloadScheduler()
+        self.download_cache = DownloadCache(
+            Path(GLib.get_user_cache_dir()) / self.APP_ID / "downloads",
+            self.DOWNLOAD_CACHE_SIZE,
+        )
+
+        self.app_installed_fonts = InstalledFonts(
+            self.installed_fonts_json_path, self.user_font_dir
+        )
+
+        # To avoid race condition between directory monitor and remove font fn
+        self.internal_removals: Set[str] = set()
+
+        # Mapped catalog behind the records, open until close_font_data
+        self.catalog: Catalog | None = None
+
+    def load_font_data(
+        self, catalog_path: Path, fonts_json_path: Path
+    ) -> Tuple[Sequence[Mapping[str, Any]], List[str], List[str]]:
+        if catalog_path.exists():
+            try:
+                # Records read from the mapped file, keep it open while they are used
+                self.catalog = Catalog(catalog_path)
+                return self.catalog, self.catalog.categories, self.catalog.subsets
+            except Exception:
+                # Outdated or broken catalog, fonts.json is always shipped
+                pass
+
+        raw_data = json.loads(fonts_json_path.read_text())
+
+        avail_cats: Set[str] = set()
+        avail_subs: Set[str] = set()
+        for font_dict in raw_data:
+            avail_cats.update(font_dict.get("category", []))
+            avail_subs.update(font_dict.get("subsets", []))
+
+        return raw_data, sorted(avail_cats), sorted(avail_subs)
+
+    def close_font_data(self):
+        if self.catalog is not None:
+            self.catalog.close()
+            self.catalog = None
+
+    async def remove_font(self, font: FontModel):
+        failures = await self.remove_fonts([font])
+        if font.family in failures:
+            raise failures[font.family]
+
+    async def remove_fonts(self, fonts: List[FontModel]) -> Dict[str, Exception]:
+        fonts = [font for font in fonts if font.family in self.app_installed_fonts]
+        dir_names = [self.app_installed_fonts[font.family] for font in fonts]
+        self.internal_removals.update(dir_names)
+
+        # All directories go in one burst, so fontconfig rescans once
+        errors, missing = await asyncio.to_thread(self.remove_font_dirs, dir_names)
+        # no event will come for them
+        self.internal_removals.difference_update(missing)
+
+        failures: Dict[str, Exception] = {}
+        for font, dir_name in zip(fonts, dir_names):
+            if dir_name in errors:
+                self.internal_removals.discard(dir_name)
+                failures[font.family] = Exception(
+                    f"Failed to remove font :{errors[dir_name]}"
+                )
+                continue
+
+            self.app_installed_fonts.remove(font.family)
+            font.is_app_installed = False
+
+        return failures
+
+    def remove_font_dirs(
+        self, dir_names: List[str]
+    ) -> Tuple[Dict[str, Exception], List[str]]:
+        # Runs on a worker thread, shared state is updated by the caller
+        errors: Dict[str, Exception] = {}
+        missing: List[str] = []
+        for dir_name in dir_names:
+            path = self.user_font_dir / dir_name
+            try:
+                if path.is_dir():
+                    shutil.rmtree(path)
+                else:
+                    missing.append(dir_name)
+            except Exception as e:
+                errors[dir_name] = e
+        return errors, missing
+
+    async def install_font(self, font: FontModel):
+        failures = await self.install_fonts([font])
+        if font.family in failures:
+            raise failures[font.family]
+
+    async def install_fonts(self, fonts: List[FontModel]) -> Dict[str, Exception]:
+        failures: Dict[str, Exception] = {}
+
+        for font in fonts:
+            font.is_installing = True
+
+        try:
+            with tempfile.TemporaryDirectory(
+                dir=self.user_font_dir.parent, prefix=".font_tmp_"
+            ) as tmp_dir:
+                # Everything is downloaded before anything is moved in
+                results = await asyncio.gather(
+                    *[self.stage_font(font, Path(tmp_dir)) for font in fonts],
+                    return_exceptions=True,
+                )
+
+                staged: List[Tuple[FontModel, Path]] = []
+                for font, result in zip(fonts, results):
+                    if isinstance(result, BaseException):
+                        failures[font.family] = self.get_install_error(result)
+                    else:
+                        staged.append((font, result))
+
+                # either every font files of a family should be installed or none
+                errors = await asyncio.to_thread(
+                    self.move_staged_fonts, [path for _, path in staged]
+                )
+
+                for font, path in staged:
+                    if path.name in errors:
+                        failures[font.family] = self.get_install_error(
+                            errors[path.name]
+                        )
+                        continue
+
+                    self.app_installed_fonts.add(font.family, path.name)
+                    font.is_app_installed = True
+
+                    # Set external installed to false after installing via app
+                    if font.is_external_installed:
+                        font.is_external_installed = False
+
+        finally:
+            for font in fonts:
+                font.is_installing = False
+
+        return failures
+
+    async def stage_font(self, font: FontModel, tmp_dir: Path) -> Path:
+        font_dir = tmp_dir / f"{font.family}_{str(uuid.uuid4())}"
+        font_dir.mkdir()
+        files = font.get_files(self.prefer_variable)
+
+        # Other fetches evict while the family downloads, keep its files until linked
+        pinned_files = [self.download_cache.get_path(url) for url in files]
+        for path in pinned_files:
+            self.download_cache.pin(path)
+
+        try:
+            cached_files = await asyncio.gather(
+                *[
+                    self.download_cache.fetch(
+                        url,
+                        lambda url, path: self.download_font_file(
+                            url,
+                            path,
+                            PRIORITY_BACKGROUND,
+                            font.file_hashes.get(url),
+                        ),
+                    )
+                    for url in files
+                ]
+            )
+
+            for url, cached_file in zip(files, cached_files):
+                await asyncio.to_thread(
+                    link_or_copy,
+                    cached_file,
+                    font_dir / PurePosixPath(urlparse(url).path).name,
+                )
+        finally:
+            for path in pinned_files:
+                self.download_cache.unpin(path)
+
+        return font_dir
+
+    def move_staged_fonts(self, font_dirs: List[Path]) -> Dict[str, Exception]:
+        errors: Dict[str, Exception] = {}
+        for font_dir in font_dirs:
+            try:
+                shutil.move(font_dir, self.user_font_dir / font_dir.name)
+            except Exception as e:
+                errors[font_dir.name] = e
+        return errors
+
+    def get_install_error(self, error: BaseException) -> Exception:
+        if isinstance(error, httpx.RequestError):
+            return Exception(
+                "Connectivity issue. Please check your internet connection."
+            )
+        if isinstance(error, httpx.HTTPStatusError):
+            return Exception(f"Server error: {error.response.status_code}")
+        return Exception(f"Installation failed: {error}")
+
+    async def download_font_file(
+        self, url: str, path: Path, priority: int, sha256: str | None = None
+    ):
+        await self.download_scheduler.download(url, path, priority, sha256)
+
+    def fetch_test_font_files(
+        self, files: List[str], file_hashes: Mapping[str, str]
+    ) -> List[asyncio.Task[Path]]:
+        # Started in the order they are shown. Priorities only order downloads
+        # waiting for a slot, the first ones started take the free slots.
+        files = sorted(files, key=get_file_order)
+
+        # the user is waiting on the test page, so it goes ahead of installs
+        return [
+            asyncio.ensure_future(
+                self.download_cache.fetch(
+                    url,
+                    lambda url, path: self.download_font_file(
+                        url,
+                        path,
+                        (
+                            PRIORITY_INTERACTIVE
+                            if url == files[0]
+                            else PRIORITY_INTERACTIVE_REST
+                        ),
+                        file_hashes.get(url),
+                    ),
+                )
+            )
+            for url in files
+        ]
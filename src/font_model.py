@@ -2,6 +2,7 @@ from pathlib import PurePosixPath
 from urllib.parse import urlparse
 
 from gi.repository import GObject
+from typing_extensions import List
 
 
 class FontModel(GObject.Object):
@@ -17,6 +18,9 @@ class FontModel(GObject.Object):
 
     is_installing = GObject.Property(type=bool, default=False)
 
+    # Picked for a batch install or removal in selection mode
+    is_selected = GObject.Property(type=bool, default=False)
+
     def __init__(
         self,
         data: dict,
@@ -35,10 +39,20 @@ class FontModel(GObject.Object):
         self.category = data["category"]
         self.subsets = data["subsets"]
         self.files = data["files"]
+        # sha256 of each file, missing in older indexes
+        self.file_hashes = dict(zip(self.files, data.get("hashes", [])))
+        # Variable font axes, and the files that cover every style with them
+        self.axes = data.get("axes", [])
+        self.variable_files = data.get("variable_files", [])
         self.preview_string = data["preview_string"]
         self.preview_family = data["preview_family"]
         self.is_preview_font_added = is_preview_font_added
 
+    def get_files(self, prefer_variable: bool) -> List[str]:
+        if prefer_variable and self.variable_files:
+            return self.variable_files
+        return self.files
+
     @GObject.Property(type=str)
     def category_label(self):
         return ", ".join(self.category)
@@ -1,7 +1,60 @@
-from gi.repository import GLib, GObject, Gtk, Pango
+from functools import lru_cache
+
+from gi.repository import Gdk, GObject, Graphene, Gsk, Gtk, Pango
 
 from .filters import Filters
 from .font_model import FontModel
+from .preview_atlas import PreviewAtlas
+
+
+# Shared by every row, so recycled rows don't rebuild the same attributes
+@lru_cache(maxsize=1024)
+def get_preview_attributes(preview_family: str | None, size: int) -> Pango.AttrList:
+    attr_list = Pango.AttrList()
+    attr_list.insert(Pango.attr_size_new(size * Pango.SCALE))
+
+    if preview_family:
+        attr_list.insert(Pango.attr_family_new(preview_family))
+        attr_list.insert(Pango.attr_fallback_new(False))
+
+    return attr_list
+
+
+class PreviewImage(Gtk.Widget):
+    """Draws a pre-rendered preview mask in the current text color."""
+
+    __gtype_name__ = "PreviewImage"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+        self.texture: Gdk.Texture | None = None
+        self.scale = 1
+
+    def set_texture(self, texture: Gdk.Texture, scale: int):
+        self.texture = texture
+        self.scale = scale
+        self.queue_draw()
+
+    def do_snapshot(self, snapshot: Gtk.Snapshot):
+        if self.texture is None:
+            return
+
+        width = self.texture.get_width() / self.scale
+        height = self.texture.get_height() / self.scale
+        bounds = Graphene.Rect().init(
+            0, (self.get_height() - height) / 2, width, height
+        )
+
+        snapshot.push_clip(
+            Graphene.Rect().init(0, 0, self.get_width(), self.get_height())
+        )
+        snapshot.push_mask(Gsk.MaskMode.ALPHA)
+        snapshot.append_texture(self.texture, bounds)
+        snapshot.pop()
+        snapshot.append_color(self.get_color(), bounds)
+        snapshot.pop()
+        snapshot.pop()
 
 
 @Gtk.Template(resource_path="/io/github/shonebinu/Glyph/font-row.ui")
@@ -9,37 +62,52 @@ class FontRow(Gtk.Box):
     __gtype_name__ = "FontRow"
 
     font_model = GObject.Property(type=FontModel)
+    selection_mode = GObject.Property(type=bool, default=False)
 
     preview_inscription: Gtk.Inscription = Gtk.Template.Child()
+    preview_image: PreviewImage = Gtk.Template.Child()
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-    def update_markup(self, model: FontModel, filters: Filters):
+    def update_preview(
+        self,
+        model: FontModel,
+        filters: Filters,
+        font_map: Pango.FontMap,
+        atlas: PreviewAtlas | None = None,
+    ):
+        texture = atlas.get_texture(model.preview_family) if atlas else None
+
+        self.preview_image.set_visible(texture is not None)
+        self.preview_inscription.set_visible(texture is None)
+
+        if atlas and texture:
+            self.preview_image.set_texture(texture, atlas.scale)
+            return
+
         size = filters.preview_size
 
         if model.is_preview_font_added:
-            family = GLib.markup_escape_text(model.preview_family)
-            text = GLib.markup_escape_text(model.preview_string)
-            markup = f'<span font_family="{family}" font="{size}" fallback="false">{text}</span>'
+            self.preview_inscription.set_font_map(font_map)
+            attr_list = get_preview_attributes(model.preview_family, size)
+            text = model.preview_string
         else:
-            markup = f'<span font="{size}">Failed to load font preview</span>'
+            attr_list = get_preview_attributes(None, size)
+            text = "Failed to load font preview"
 
-        self.preview_inscription.set_markup(markup)
+        self.preview_inscription.set_attributes(attr_list)
+        self.preview_inscription.set_text(text)
 
     def bind_row_data(
-        self, model: FontModel, filters: Filters, font_map: Pango.FontMap
+        self,
+        model: FontModel,
+        filters: Filters,
+        font_map: Pango.FontMap,
+        atlas: PreviewAtlas | None = None,
     ):
         self.font_model = model
-
-        if model.is_preview_font_added:
-            self.preview_inscription.set_font_map(font_map)
-
-        filters.connect(
-            "notify::preview-size", lambda *_: self.update_markup(model, filters)
-        )
-
-        self.update_markup(model, filters)
+        self.update_preview(model, filters, font_map, atlas)
 
     @Gtk.Template.Callback()
     def should_show_separator(
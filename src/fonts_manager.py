@@ -1,22 +1,21 @@
 import asyncio
 import json
-import shutil
-import tempfile
-import uuid
-from pathlib import Path, PurePosixPath
-from urllib.parse import urlparse
+from collections import OrderedDict
+from pathlib import Path
 
-import anyio
 import gi
 import httpx
-from typing_extensions import Any, Dict, List, Set, Tuple, TypedDict
+from typing_extensions import Any, AsyncIterator, Dict, List, Set, Tuple, TypedDict
 
 gi.require_version("PangoFc", "1.0")
 # PangoFc needs to be imported for using FontMap.config_changed method
 from gi.repository import Gio, GLib, Gtk, Pango, PangoCairo, PangoFc  # type: ignore
 
 from .filters import Filters
+from .font_library import FontLibrary
 from .font_model import FontModel
+from .preview_atlas import ATLAS_SIZES, PreviewAtlas, load_or_build_atlas
+from .search_index import SearchIndex
 
 
 class FontFace(TypedDict):
@@ -26,37 +25,63 @@ class FontFace(TypedDict):
     desc: Pango.FontDescription
 
 
-class FontsManager:
-    APP_ID = "io.github.shonebinu.Glyph"
+class FontsManager(FontLibrary):
+    # Directory monitor events within this window are handled as one batch
+    MONITOR_BATCH_DELAY_MS = 100
+    # Models built before the window shows, the rest are added in batches
+    FIRST_BATCH_SIZE = 64
+    BATCH_SIZE = 256
+    # Test font maps kept for revisits, bounded by count and font file size
+    TEST_FONT_CACHE_COUNT = 8
+    TEST_FONT_CACHE_BYTES = 64 * 1024 * 1024
 
-    def __init__(self):
+    def __init__(self, data_dir: Path = FontLibrary.DATA_DIR):
+        super().__init__(data_dir)
         self.filters = Filters()
-
-        self.user_font_dir = Path("~/.local/share/fonts/").expanduser()
-        self.user_font_dir.mkdir(parents=True, exist_ok=True)
-        self.installed_fonts_json_path = (
-            Path(GLib.get_user_data_dir()) / self.APP_ID / "installed.json"
-        )
-        self.installed_fonts_json_path.parent.mkdir(parents=True, exist_ok=True)
+        self.filters.connect("notify::prefer-variable", self.on_prefer_variable_changed)
 
         self.default_font_map = PangoCairo.FontMap.get_default()
         self.custom_font_map = PangoCairo.FontMap.new()
-        self.httpx_client = httpx.AsyncClient()
 
-        self.app_installed_fonts = self.get_app_installed_fonts()
+        # Snapshot of fontconfig families, refreshed on fontconfig updates
+        self.system_fonts = self.get_all_installed_fonts()
+
+        data_dir = self.data_dir
+        self.preview_files_path = data_dir / "previews"
+        self.collections_index_path = self.preview_files_path / "collections.json"
+        self.requested_preview_fonts: Set[str] = set()
+
+        self.atlas_dir = Path(GLib.get_user_cache_dir()) / self.APP_ID / "atlas"
+        self.preview_atlases: Dict[int, PreviewAtlas] = {}
+
+        # (family, variable) -> (font map, faces, bytes of font files, pinned files)
+        self.test_fonts: OrderedDict[
+            Tuple[str, bool], Tuple[Pango.FontMap, List[FontFace], int, List[Path]]
+        ] = OrderedDict()
+        self.test_fonts_bytes = 0
 
-        data_dir = Path(f"/app/share/{self.APP_ID}")
-        fonts, categories, subsets, self.family_model_map = self.prepare_font_data(
-            data_dir / "fonts.json", data_dir / "previews"
+        self.records, categories, subsets = self.load_font_data(
+            data_dir / "fonts.bin", data_dir / "fonts.json"
         )
-        self.font_store = Gio.ListStore.new(FontModel)
-        self.font_store.splice(0, 0, fonts)
-        self.available_categories = Gtk.StringList().new(categories)
-        self.available_subsets = Gtk.StringList().new(subsets)
+        # Built by populate_font_store next to the model batches
+        self.search_index: SearchIndex | None = None
+        self.search_index_ready = asyncio.Event()
+        self.family_model_map: Dict[str, FontModel] = {}
+        # Set once every record has a model and the catalog is closed
+        self.font_store_populated = asyncio.Event()
+
+        self.load_custom_fonts(self.collections_index_path)
 
-        # To avoid race condition between directory monitor and remove font fn
-        self.internal_removals = set()
+        # The first screenful is shown right away, populate_font_store adds the rest
+        self.font_store = Gio.ListStore.new(FontModel)
+        self.add_font_models(
+            self.create_font_models(self.records[: self.FIRST_BATCH_SIZE])
+        )
+        self.available_categories = Gtk.StringList().new(["All"] + categories)
+        self.available_subsets = Gtk.StringList().new(["All"] + subsets)
 
+        self.deleted_font_dirs: Set[str] = set()
+        self.deleted_font_dirs_source_id = None
         self.user_font_dir_monitor = Gio.File.new_for_path(
             str(self.user_font_dir)
         ).monitor_directory(Gio.FileMonitorFlags.NONE)
@@ -71,144 +96,171 @@ class FontsManager:
     def get_all_installed_fonts(self) -> Set[str]:
         return {family.get_name() for family in self.default_font_map.list_families()}
 
-    def get_app_installed_fonts(self) -> Dict[str, str]:
-        try:
-            raw_installed_fonts: Dict[str, str] = json.loads(
-                self.installed_fonts_json_path.read_text()
-            )
-        except Exception:
-            return {}
+    def create_font_models(self, records: List[Dict[str, Any]]) -> List[FontModel]:
+        return [FontModel(font_dict) for font_dict in records]
 
-        installed_fonts = {
-            fam: di
-            for fam, di in raw_installed_fonts.items()
-            if (self.user_font_dir / di).is_dir()
-        }
+    def add_font_models(self, fonts: List[FontModel]):
+        # Installed state is set here, it may have changed while models were built
+        for model in fonts:
+            family = model.family
+            self.family_model_map[family] = model
 
-        if len(installed_fonts) != len(raw_installed_fonts):
-            self.installed_fonts_json_path.write_text(
-                json.dumps(installed_fonts, indent=2)
+            model.is_app_installed = family in self.app_installed_fonts
+            model.is_external_installed = (
+                family in self.system_fonts and not model.is_app_installed
             )
 
-        return installed_fonts
+            is_added = self.collection_preview_fonts.get(model.preview_family)
+            if is_added is not None:
+                self.requested_preview_fonts.add(family)
+                model.is_preview_font_added = is_added
 
-    def prepare_font_data(
-        self, fonts_json_path: Path, preview_files_path: Path
-    ) -> Tuple[List[FontModel], List[str], List[str], Dict[str, FontModel]]:
-        raw_data = json.loads(fonts_json_path.read_text())
+        self.font_store.splice(self.font_store.get_n_items(), 0, fonts)
 
-        failed_families = self.load_custom_fonts(
-            self.custom_font_map, preview_files_path, raw_data
-        )
+    async def build_search_index(self):
+        self.search_index = await asyncio.to_thread(SearchIndex, self.records)
+        self.search_index_ready.set()
 
-        fonts = []
-        avail_cats: Set[str] = set()
-        avail_subs: Set[str] = set()
-        family_model_map = {}
+    async def populate_font_store(self):
+        # The index covers the whole catalog, until then only loaded models are searched
+        search_index_task = asyncio.create_task(self.build_search_index())
 
-        for font_dict in raw_data:
-            family = font_dict["family"]
-            is_app_installed = family in self.app_installed_fonts
-            is_external_installed = (
-                family in self.get_all_installed_fonts() and not is_app_installed
+        # Models are built off the main loop, the list updates as batches land
+        for start in range(
+            self.font_store.get_n_items(), len(self.records), self.BATCH_SIZE
+        ):
+            fonts = await asyncio.to_thread(
+                self.create_font_models, self.records[start : start + self.BATCH_SIZE]
             )
-            is_preview_font_added = family not in failed_families
+            self.add_font_models(fonts)
 
-            model = FontModel(
-                font_dict,
-                is_app_installed=is_app_installed,
-                is_external_installed=is_external_installed,
-                is_preview_font_added=is_preview_font_added,
-            )
+        await search_index_task
 
-            fonts.append(model)
-            avail_cats.update(font_dict.get("category", []))
-            avail_subs.update(font_dict.get("subsets", []))
-            family_model_map[family] = model
+        # Models hold everything read from the catalog from here on
+        self.records = []
+        self.close_font_data()
+        self.font_store_populated.set()
 
-        categories = ["All"] + sorted(list(avail_cats))
-        subsets = ["All"] + sorted(list(avail_subs))
+    def load_custom_fonts(self, collections_index_path: Path):
+        # preview family -> whether its collection was added
+        self.collection_preview_fonts: Dict[str, bool] = {}
 
-        return fonts, categories, subsets, family_model_map
+        # Preview fonts packed into collections are cheap to register all at once
+        try:
+            index: Dict[str, List[Dict[str, Any]]] = json.loads(
+                collections_index_path.read_text()
+            )
+        except Exception:
+            return
 
-    def load_custom_fonts(
-        self,
-        font_map: Pango.FontMap,
-        preview_files_path: Path,
-        font_data: List[Dict[str, Any]],
-    ) -> Set[str]:
-        failed_families = set()
+        for collection, faces in index.items():
+            success = self.custom_font_map.add_font_file(
+                str(self.preview_files_path / collection)
+            )
 
-        for font in font_data:
-            family = font["family"]
-            preview_family = font["preview_family"]
+            for face in faces:
+                self.collection_preview_fonts[face["preview_family"]] = success
 
-            preview_file = preview_files_path / f"{preview_family}.ttf"
+    def load_preview_font(self, font: FontModel) -> bool:
+        self.load_preview_fonts([font])
+        return font.is_preview_font_added
 
-            if not preview_file.exists():
-                failed_families.add(family)
+    def load_preview_fonts(self, fonts: List[FontModel]):
+        # Registered on first use, most families are never scrolled into view
+        for font in fonts:
+            if font.family in self.requested_preview_fonts:
                 continue
+            self.requested_preview_fonts.add(font.family)
 
-            success = font_map.add_font_file(str(preview_file))
-            if not success:
-                failed_families.add(family)
+            preview_file = self.preview_files_path / f"{font.preview_family}.ttf"
 
-        return failed_families
+            if not preview_file.exists():
+                continue
 
-    def sync_installed_fonts_json(self):
-        self.installed_fonts_json_path.write_text(
-            json.dumps(self.app_installed_fonts, indent=2)
-        )
+            font.is_preview_font_added = self.custom_font_map.add_font_file(
+                str(preview_file)
+            )
 
-    async def remove_font(self, font: FontModel):
+    def get_preview_font_files(self) -> List[Path]:
         try:
-            dir_name = self.app_installed_fonts[font.family]
+            index = json.loads(self.collections_index_path.read_text())
+            return [self.preview_files_path / collection for collection in index]
+        except Exception:
+            pass
+
+        preview_files = [
+            self.preview_files_path / f"{font.preview_family}.ttf"
+            for font in self.family_model_map.values()
+        ]
+        return [path for path in preview_files if path.exists()]
+
+    async def load_preview_atlases(self, scale: int):
+        # The atlas covers the whole catalog, not only the models loaded so far
+        await self.font_store_populated.wait()
+        previews = [
+            (font.preview_family, font.preview_string)
+            for font in self.family_model_map.values()
+        ]
+        font_files = await asyncio.to_thread(self.get_preview_font_files)
+
+        for size in ATLAS_SIZES:
+            if size in self.preview_atlases:
+                continue
 
-            path = self.user_font_dir / dir_name
-            if path.is_dir():
-                self.internal_removals.add(dir_name)
-                await asyncio.to_thread(shutil.rmtree, path)
+            self.preview_atlases[size] = await asyncio.to_thread(
+                load_or_build_atlas,
+                self.atlas_dir / f"preview-{size}@{scale}x.atlas",
+                size,
+                scale,
+                font_files,
+                previews,
+            )
 
-            self.app_installed_fonts.pop(font.family)
-            self.sync_installed_fonts_json()
-            font.is_app_installed = False
+    async def stream_font_for_test(
+        self, font: FontModel
+    ) -> AsyncIterator[Tuple[Pango.FontMap, List[FontFace]]]:
+        # Yields the faces of every file as soon as it is downloaded
+        files = font.get_files(self.prefer_variable)
+        key = (font.family, files is font.variable_files)
 
-        except Exception as e:
-            raise Exception(f"Failed to remove font :{e}")
+        if key in self.test_fonts:
+            self.test_fonts.move_to_end(key)
+            test_font_map, font_faces, _, _ = self.test_fonts[key]
+            yield test_font_map, font_faces
+            return
 
-    async def install_font(self, font: FontModel):
-        try:
-            font.is_installing = True
+        test_font_map = PangoCairo.FontMap.new()
 
-            font_destination_path = (
-                self.user_font_dir / f"{font.family}_{str(uuid.uuid4())}"
-            )
+        # The font map reads its files as long as it lives, keep them in the cache
+        pinned_files = [self.download_cache.get_path(url) for url in files]
+        for path in pinned_files:
+            self.download_cache.pin(path)
 
-            # either every font files should be installed or none
-            with tempfile.TemporaryDirectory(
-                dir=self.user_font_dir.parent, prefix=".font_tmp_"
-            ) as tmp_dir:
-                tmp_dir_path = Path(tmp_dir)
-
-                tasks = [
-                    self.download_font_file(
-                        url, tmp_dir_path / PurePosixPath(urlparse(url).path).name
-                    )
-                    for url in font.files
-                ]
+        tasks = self.fetch_test_font_files(files, font.file_hashes)
 
-                await asyncio.gather(*tasks)
-                await asyncio.to_thread(
-                    shutil.move, tmp_dir_path, font_destination_path
-                )
+        font_faces: List[FontFace] = []
+        size = 0
+        # the pins stay with this stream until the test font cache takes them
+        completed = False
 
-            self.app_installed_fonts[font.family] = font_destination_path.name
-            self.sync_installed_fonts_json()
-            font.is_app_installed = True
+        try:
+            for task in asyncio.as_completed(tasks):
+                file = await task
+                await asyncio.to_thread(test_font_map.add_font_file, str(file))
+                size += file.stat().st_size
+
+                face_names = {face["name"] for face in font_faces}
+                new_faces = [
+                    face
+                    for face in self.get_test_faces(test_font_map, font.family)
+                    if face["name"] not in face_names
+                ]
+                font_faces.extend(new_faces)
+
+                if new_faces:
+                    yield test_font_map, new_faces
 
-            # Set external installed to false after installing via app
-            if font.is_external_installed:
-                font.is_external_installed = False
+            completed = True
 
         except httpx.RequestError:
             raise Exception(
@@ -217,75 +269,71 @@ class FontsManager:
         except httpx.HTTPStatusError as e:
             raise Exception(f"Server error: {e.response.status_code}")
         except Exception as e:
-            raise Exception(f"Installation failed: {e}")
+            raise Exception(f"Font files download failed: {e}")
         finally:
-            font.is_installing = False
-
-    async def download_font_file(self, url: str, path: Path):
-        async with self.httpx_client.stream("GET", url, follow_redirects=True) as resp:
-            resp.raise_for_status()
-            async with await anyio.open_file(path, "wb") as f:
-                async for chunk in resp.aiter_bytes(chunk_size=256 * 1024):
-                    await f.write(chunk)
-
-    async def download_font_for_test(
-        self, font: FontModel
-    ) -> Tuple[Pango.FontMap, list[FontFace]]:
-        test_font_map = PangoCairo.FontMap.new()
-
-        try:
-            # temp folder should not get cleaned
-            with tempfile.TemporaryDirectory(delete=False) as tmp_dir:
-                tmp_dir_path = Path(tmp_dir)
-
-                tasks = [
-                    self.download_font_file(
-                        url, tmp_dir_path / PurePosixPath(urlparse(url).path).name
-                    )
-                    for url in font.files
-                ]
-
-                await asyncio.gather(*tasks)
-
-                await asyncio.to_thread(
-                    lambda: [
-                        test_font_map.add_font_file(str(file))
-                        for file in tmp_dir_path.iterdir()
-                    ]
+            # Leftover downloads still finish into the download cache
+            for task in tasks:
+                task.add_done_callback(
+                    lambda task: task.cancelled() or task.exception()
                 )
 
-                pango_family = test_font_map.get_family(font.family)
+            # failed, or replaced by a newer stream
+            if not completed:
+                self.unpin_files(pinned_files)
 
-                font_faces: list[FontFace] = []
-                for face in pango_family.list_faces():
-                    face_desc = face.describe()
+        font_faces.sort(key=lambda face: (face["weight"], face["style"]))
+        # glyph caches of a font map grow with the size of its fonts
+        self.cache_test_font(key, test_font_map, font_faces, size, pinned_files)
 
-                    face_name = face.get_face_name()
-                    weight = face_desc.get_weight()
-                    # normal style is 0
-                    style = face_desc.get_style()
+    def get_test_faces(self, font_map: Pango.FontMap, family: str) -> List[FontFace]:
+        pango_family = font_map.get_family(family)
+        if pango_family is None:
+            return []
 
-                    font_faces.append(
-                        {
-                            "name": face_name,
-                            "weight": weight,
-                            "style": style,
-                            "desc": face_desc,
-                        }
-                    )
+        font_faces: List[FontFace] = []
+        for face in pango_family.list_faces():
+            face_desc = face.describe()
 
-                font_faces.sort(key=lambda face: (face["weight"], face["style"]))
+            font_faces.append(
+                {
+                    "name": face.get_face_name(),
+                    "weight": face_desc.get_weight(),
+                    # normal style is 0
+                    "style": face_desc.get_style(),
+                    "desc": face_desc,
+                }
+            )
 
-                return test_font_map, font_faces
+        return font_faces
 
-        except httpx.RequestError:
-            raise Exception(
-                "Connectivity issue. Please check your internet connection."
-            )
-        except httpx.HTTPStatusError as e:
-            raise Exception(f"Server error: {e.response.status_code}")
-        except Exception as e:
-            raise Exception(f"Font files download failed: {e}")
+    def cache_test_font(
+        self,
+        key: Tuple[str, bool],
+        font_map: Pango.FontMap,
+        faces: List[FontFace],
+        size: int,
+        pinned_files: List[Path],
+    ):
+        if key in self.test_fonts:
+            _, _, old_size, old_files = self.test_fonts.pop(key)
+            self.test_fonts_bytes -= old_size
+            self.unpin_files(old_files)
+
+        self.test_fonts[key] = (font_map, faces, size, pinned_files)
+        self.test_fonts_bytes += size
+
+        # the newest one stays, it is the one on screen
+        while len(self.test_fonts) > 1 and (
+            len(self.test_fonts) > self.TEST_FONT_CACHE_COUNT
+            or self.test_fonts_bytes > self.TEST_FONT_CACHE_BYTES
+        ):
+            _, (_, _, evicted_size, evicted_files) = self.test_fonts.popitem(last=False)
+            self.test_fonts_bytes -= evicted_size
+            self.unpin_files(evicted_files)
+
+    def unpin_files(self, files: List[Path]):
+        for path in files:
+            self.download_cache.unpin(path)
 
     def on_user_font_dir_changed(
         self,
@@ -294,44 +342,56 @@ class FontsManager:
         other_file: Gio.File,
         event_type: Gio.FileMonitorEvent,
     ):
-        if event_type == Gio.FileMonitorEvent.DELETED:
-            deleted_dir = file.get_basename()
+        if event_type != Gio.FileMonitorEvent.DELETED:
+            return
+
+        # A bulk removal fires an event per directory, handle them together
+        self.deleted_font_dirs.add(file.get_basename())
 
+        if self.deleted_font_dirs_source_id is None:
+            self.deleted_font_dirs_source_id = GLib.timeout_add(
+                self.MONITOR_BATCH_DELAY_MS, self.on_font_dirs_deleted
+            )
+
+    def on_font_dirs_deleted(self):
+        self.deleted_font_dirs_source_id = None
+        deleted_dirs = self.deleted_font_dirs
+        self.deleted_font_dirs = set()
+
+        for deleted_dir in deleted_dirs:
             if deleted_dir in self.internal_removals:
                 self.internal_removals.remove(deleted_dir)
-                return
-
-            family = next(
-                (
-                    fam
-                    for fam, di in self.app_installed_fonts.items()
-                    if di == deleted_dir
-                ),
-                None,
-            )
+                continue
 
+            family = self.app_installed_fonts.get_family(deleted_dir)
             if not family:
-                return
+                continue
 
-            self.app_installed_fonts.pop(family)
-            self.sync_installed_fonts_json()
+            # journaled together in the store's next write
+            self.app_installed_fonts.remove(family)
 
-            model = self.family_model_map[family]
-            if model.is_app_installed:
+            # not built yet, it picks up the change when it is
+            model = self.family_model_map.get(family)
+            if model and model.is_app_installed:
                 model.is_app_installed = False
 
+        return GLib.SOURCE_REMOVE
+
+    def on_prefer_variable_changed(self, filters: Filters, _):
+        self.prefer_variable = filters.prefer_variable
+
     def on_fontconfig_updated(self, *_):
         # for the change to appear in font map
         self.default_font_map.config_changed()  # type: ignore
 
-        all_installed_fonts = self.get_all_installed_fonts()
+        self.system_fonts = self.get_all_installed_fonts()
 
         for fam, model in self.family_model_map.items():
             # skip if app installed
             if fam in self.app_installed_fonts:
                 continue
 
-            is_ext = fam in all_installed_fonts
+            is_ext = fam in self.system_fonts
 
             if model.is_external_installed != is_ext:
                 model.is_external_installed = is_ext
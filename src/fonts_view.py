@@ -1,10 +1,14 @@
-from typing import cast
+import asyncio
+from typing import Dict, List, Set, cast
 
-from gi.repository import Adw, Gio, GObject, Gtk
+from gi.repository import Adw, Gdk, Gio, GLib, GObject, Gtk
 
+from .filters import Filters
 from .font_model import FontModel
 from .font_row import FontRow
 from .fonts_manager import FontsManager
+from .preview_atlas import PreviewAtlas
+from .search_index import SearchIndex, normalize
 from .sheet_view import SheetView
 
 
@@ -12,55 +16,250 @@ from .sheet_view import SheetView
 class FontsView(Adw.Bin):
     __gtype_name__ = "FontsView"
 
+    # Roughly one screenful of rows
+    PREVIEW_PREFETCH_COUNT = 12
+    # Bursts of filter changes within this window are applied together
+    FILTER_DEBOUNCE_MS = 60
+    # Rows jumped per frame with LIPI_FRAME_STATS=scroll, about a fast fling
+    SCROLL_STEP = 3
+
     font_store = GObject.Property(type=Gio.ListModel)
+    # Activating a row toggles it for a batch install or removal
+    selection_mode = GObject.Property(type=bool, default=False)
+
+    @GObject.Signal(arg_types=(str,))
+    def show_toast(self, msg: str):
+        pass
 
     list_view: Gtk.ListView = Gtk.Template.Child()
     selection_model: Gtk.NoSelection = Gtk.Template.Child()
     bottom_sheet_layout: Adw.BottomSheet = Gtk.Template.Child()
     view_stack: Adw.ViewStack = Gtk.Template.Child()
     sheet_view: SheetView = Gtk.Template.Child()
+    sort_model: Gtk.SortListModel = Gtk.Template.Child()
     filter_model: Gtk.FilterListModel = Gtk.Template.Child()
     custom_filter: Gtk.CustomFilter = Gtk.Template.Child()
+    selection_label: Gtk.Label = Gtk.Template.Child()
+    install_selected_button: Gtk.Button = Gtk.Template.Child()
+    remove_selected_button: Gtk.Button = Gtk.Template.Child()
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
         self.filter_model.connect("items-changed", self.on_font_items_changed)
 
+        # Set LIPI_FRAME_STATS=1 to print frame times while scrolling, or
+        # LIPI_FRAME_STATS=scroll to also scroll through the list once
+        if GLib.getenv("LIPI_FRAME_STATS"):
+            self.frame_intervals: List[float] = []
+            self.last_frame_time = 0
+            self.list_view.connect("realize", self.on_list_view_realize)
+
+        self.prefetch_position = 0
+        self.prefetch_source_id = None
+
+        self.filter_source_id = None
+        self.filter_generation = 0
+
+        # Rows currently showing a font, they are recycled while scrolling
+        self.bound_rows: Set[FontRow] = set()
+
+        # Only set on the sort model while there are ranked results
+        self.custom_sorter = Gtk.CustomSorter.new(self.sort_func)
+
+        self.selected_fonts: Dict[str, FontModel] = {}
+        self.connect("notify::selection-mode", self.on_selection_mode_changed)
+
     def set_fonts_manager(self, fonts_manager: FontsManager):
         self.fonts_manager = fonts_manager
         self.font_store = fonts_manager.font_store
         self.sheet_view.set_fonts_manager(fonts_manager)
 
+        # Built in the background, loaded_filters stand in for it until then
+        self.search_index: SearchIndex | None = None
+        self.matches = 0
+        self.scores: Dict[int, float] = {}
+        self.installed_only = fonts_manager.filters.installed_only
+        self.set_loaded_filters()
+        asyncio.create_task(self.wait_for_search_index())
+
         self.custom_filter.set_filter_func(self.filter_func)
         self.fonts_manager.filters.connect("notify", self.on_filters_changed)
+        self.fonts_manager.filters.connect(
+            "notify::preview-size", self.on_preview_size_changed
+        )
+        self.fonts_manager.filters.connect(
+            "notify::preview-atlas", self.on_preview_atlas_changed
+        )
 
-    def filter_func(self, item) -> bool:
-        font = cast(FontModel, item)
+    def set_loaded_filters(self):
         filters = self.fonts_manager.filters
+        self.loaded_filters = (
+            normalize(filters.search_query).strip(),
+            filters.category,
+            filters.subset,
+        )
 
-        if filters.search_query:
-            q = filters.search_query.lower()
-            if q not in font.display_name.lower() and q not in font.family.lower():
-                return False
+    def match_loaded_font(self, font: FontModel) -> bool:
+        # Plain name and designer check, only used until the index is ready
+        query, category, subset = self.loaded_filters
 
-        if filters.category != "All" and filters.category not in font.category:
+        if category != "All" and category not in font.category:
             return False
 
-        if filters.subset != "All" and filters.subset not in font.subsets:
+        if subset != "All" and subset not in font.subsets:
+            return False
+
+        return not query or query in normalize(
+            f"{font.display_name}\n{font.family}\n{font.designer}"
+        )
+
+    async def wait_for_search_index(self):
+        await self.fonts_manager.search_index_ready.wait()
+        search_index = self.fonts_manager.search_index
+        filters = self.fonts_manager.filters
+        generation = self.filter_generation
+
+        matches, scores = await asyncio.to_thread(
+            search_index.match,
+            filters.search_query,
+            filters.category,
+            filters.subset,
+            filters.fuzzy_search,
+        )
+
+        # Any refilter from here on goes through the index
+        self.search_index = search_index
+        self.matches = matches
+        self.scores = scores
+        self.installed_only = filters.installed_only
+        self.custom_filter.changed(Gtk.FilterChange.DIFFERENT)
+
+        if scores:
+            self.sort_model.set_sorter(self.custom_sorter)
+
+        # filters changed while matching, match them again through the index
+        if generation != self.filter_generation:
+            await self.refilter(self.filter_generation)
+
+    def filter_func(self, item) -> bool:
+        font = cast(FontModel, item)
+
+        if self.search_index is None:
+            if not self.match_loaded_font(font):
+                return False
+        elif not self.matches >> self.search_index.positions[font.family] & 1:
             return False
 
-        if filters.installed_only and not font.is_app_installed:
+        if self.installed_only and not font.is_app_installed:
             return False
 
         return True
 
-    def on_filters_changed(self, *_):
-        self.custom_filter.changed(Gtk.FilterChange.DIFFERENT)
+    def sort_func(self, item_a, item_b, *_) -> Gtk.Ordering:
+        pos_a = self.search_index.positions[cast(FontModel, item_a).family]
+        pos_b = self.search_index.positions[cast(FontModel, item_b).family]
+        # higher score first, catalog order between equal scores
+        key_a = (-self.scores.get(pos_a, 0), pos_a)
+        key_b = (-self.scores.get(pos_b, 0), pos_b)
+
+        if key_a < key_b:
+            return Gtk.Ordering.SMALLER
+        if key_a > key_b:
+            return Gtk.Ordering.LARGER
+        return Gtk.Ordering.EQUAL
+
+    def on_filters_changed(self, _, pspec: GObject.ParamSpec):
+        if pspec.name in ("preview-size", "preview-atlas", "prefer-variable"):
+            return
+
+        self.filter_generation += 1
+
+        if self.filter_source_id is not None:
+            GLib.source_remove(self.filter_source_id)
+        self.filter_source_id = GLib.timeout_add(
+            self.FILTER_DEBOUNCE_MS, self.on_filter_timeout
+        )
+
+    def on_filter_timeout(self):
+        self.filter_source_id = None
+        asyncio.create_task(self.refilter(self.filter_generation))
+        return GLib.SOURCE_REMOVE
+
+    async def refilter(self, generation: int):
+        filters = self.fonts_manager.filters
+
+        if self.search_index is None:
+            self.set_loaded_filters()
+            self.installed_only = filters.installed_only
+            self.custom_filter.changed(Gtk.FilterChange.DIFFERENT)
+            return
+
+        matches, scores = await asyncio.to_thread(
+            self.search_index.match,
+            filters.search_query,
+            filters.category,
+            filters.subset,
+            filters.fuzzy_search,
+        )
+        installed_only = filters.installed_only
+
+        # filters changed again while matching, a newer refilter will follow
+        if generation != self.filter_generation:
+            return
+
+        self.apply_matches(matches, scores, installed_only)
+
+    def apply_matches(
+        self, matches: int, scores: Dict[int, float], installed_only: bool
+    ):
+        # Narrower filters only need to recheck the current results
+        more_strict = (
+            matches & ~self.matches == 0 and installed_only >= self.installed_only
+        )
+        less_strict = (
+            self.matches & ~matches == 0 and installed_only <= self.installed_only
+        )
+
+        filter_changed = not (more_strict and less_strict)
+        scores_changed = scores != self.scores
+
+        self.matches = matches
+        self.scores = scores
+        self.installed_only = installed_only
+
+        if not filter_changed and not scores_changed:
+            return
+
+        # fonts arriving at startup also change the list, only filters close the sheet
+        if self.bottom_sheet_layout.get_open():
+            self.bottom_sheet_layout.set_open(False)
+
+        if filter_changed:
+            if more_strict:
+                self.custom_filter.changed(Gtk.FilterChange.MORE_STRICT)
+            elif less_strict:
+                self.custom_filter.changed(Gtk.FilterChange.LESS_STRICT)
+            else:
+                self.custom_filter.changed(Gtk.FilterChange.DIFFERENT)
+
+        if scores_changed:
+            if not scores:
+                self.sort_model.set_sorter(None)
+            elif self.sort_model.get_sorter() is None:
+                self.sort_model.set_sorter(self.custom_sorter)
+            else:
+                self.custom_sorter.changed(Gtk.SorterChange.DIFFERENT)
+
+        if self.selection_model.get_n_items() > 0:
+            self.list_view.scroll_to(0, Gtk.ListScrollFlags.NONE, None)
 
     @Gtk.Template.Callback()
     def on_factory_setup(self, _, list_item: Gtk.ListItem):
         row = FontRow()
+        self.bind_property(
+            "selection-mode", row, "selection-mode", GObject.BindingFlags.SYNC_CREATE
+        )
         list_item.set_child(row)
 
     @Gtk.Template.Callback()
@@ -68,24 +267,242 @@ class FontsView(Adw.Bin):
         row = cast(FontRow, list_item.get_child())
         model = cast(FontModel, list_item.get_item())
 
+        atlas = self.get_preview_atlas()
+        if atlas is None or not atlas.has_preview(model.preview_family):
+            self.fonts_manager.load_preview_font(model)
+
         row.bind_row_data(
-            model, self.fonts_manager.filters, self.fonts_manager.custom_font_map
+            model,
+            self.fonts_manager.filters,
+            self.fonts_manager.custom_font_map,
+            atlas,
+        )
+
+        self.bound_rows.add(row)
+        self.schedule_preview_prefetch(list_item.get_position())
+
+    @Gtk.Template.Callback()
+    def on_factory_unbind(self, _, list_item: Gtk.ListItem):
+        self.bound_rows.discard(cast(FontRow, list_item.get_child()))
+
+    def get_preview_atlas(self) -> PreviewAtlas | None:
+        filters = self.fonts_manager.filters
+        if not filters.preview_atlas:
+            return None
+        return self.fonts_manager.preview_atlases.get(filters.preview_size)
+
+    def on_preview_size_changed(self, *_):
+        atlas = self.get_preview_atlas()
+
+        for row in self.bound_rows:
+            model = row.font_model
+            if atlas is None or not atlas.has_preview(model.preview_family):
+                self.fonts_manager.load_preview_font(model)
+
+            row.update_preview(
+                model,
+                self.fonts_manager.filters,
+                self.fonts_manager.custom_font_map,
+                atlas,
+            )
+
+    def on_preview_atlas_changed(self, filters: Filters, _):
+        if filters.preview_atlas:
+            asyncio.create_task(self.load_preview_atlases())
+        else:
+            self.on_preview_size_changed()
+
+    async def load_preview_atlases(self):
+        try:
+            await self.fonts_manager.load_preview_atlases(self.get_scale_factor())
+        except Exception as e:
+            self.emit("show-toast", f"Failed to render previews: {e}")
+
+        self.on_preview_size_changed()
+
+    def schedule_preview_prefetch(self, position: int):
+        self.prefetch_position = position
+
+        if self.prefetch_source_id is None:
+            # Font maps aren't thread safe, so prefetch when the main loop is idle
+            self.prefetch_source_id = GLib.idle_add(
+                self.prefetch_preview_fonts, priority=GLib.PRIORITY_LOW
+            )
+
+    def prefetch_preview_fonts(self):
+        self.prefetch_source_id = None
+
+        start = self.prefetch_position + 1
+        end = min(
+            start + self.PREVIEW_PREFETCH_COUNT, self.selection_model.get_n_items()
         )
+        fonts = [
+            cast(FontModel, self.selection_model.get_item(pos))
+            for pos in range(start, end)
+        ]
+
+        atlas = self.get_preview_atlas()
+        if atlas is not None:
+            fonts = [
+                font for font in fonts if not atlas.has_preview(font.preview_family)
+            ]
+
+        self.fonts_manager.load_preview_fonts(fonts)
+
+        return GLib.SOURCE_REMOVE
 
     def set_search_query(self, text: str):
         self.fonts_manager.filters.search_query = text
 
     def on_font_items_changed(self, *_):
-        if self.bottom_sheet_layout.get_open():
-            self.bottom_sheet_layout.set_open(False)
         if self.selection_model.get_n_items() > 0:
             self.view_stack.set_visible_child_name("results")
-            self.list_view.scroll_to(0, Gtk.ListScrollFlags.NONE, None)
         else:
             self.view_stack.set_visible_child_name("empty")
 
+    def on_list_view_realize(self, list_view: Gtk.ListView):
+        frame_clock = list_view.get_frame_clock()
+        if frame_clock:
+            frame_clock.connect("after-paint", self.on_after_paint)
+
+        if GLib.getenv("LIPI_FRAME_STATS") == "scroll":
+            self.scroll_position = 0
+            list_view.add_tick_callback(self.on_scroll_tick)
+
+    def on_scroll_tick(self, list_view: Gtk.ListView, _) -> bool:
+        n_items = self.selection_model.get_n_items()
+        # the fonts are not loaded yet
+        if n_items == 0:
+            return GLib.SOURCE_CONTINUE
+
+        self.scroll_position += self.SCROLL_STEP
+        if self.scroll_position >= n_items:
+            return GLib.SOURCE_REMOVE
+
+        list_view.scroll_to(self.scroll_position, Gtk.ListScrollFlags.NONE, None)
+        return GLib.SOURCE_CONTINUE
+
+    def on_after_paint(self, frame_clock: Gdk.FrameClock):
+        frame_time = frame_clock.get_frame_time()
+        interval = (frame_time - self.last_frame_time) / 1000
+        self.last_frame_time = frame_time
+
+        # longer gaps are idle time between scrolls, not slow frames
+        if interval > 250:
+            return
+
+        self.frame_intervals.append(interval)
+
+        if len(self.frame_intervals) >= 120:
+            intervals = sorted(self.frame_intervals)
+            self.frame_intervals.clear()
+            print(
+                f"Frame times over {len(intervals)} frames: "
+                f"median {intervals[len(intervals) // 2]:.1f} ms, "
+                f"p95 {intervals[int(len(intervals) * 0.95)]:.1f} ms, "
+                f"max {intervals[-1]:.1f} ms"
+            )
+
     @Gtk.Template.Callback()
     def on_list_item_activated(self, _, position):
         font_item = cast(FontModel, self.selection_model.get_item(position))
+
+        if self.selection_mode:
+            self.toggle_font_selected(font_item)
+            return
+
         self.sheet_view.font_model = font_item
         self.bottom_sheet_layout.set_open(True)
+
+    def toggle_font_selected(self, font: FontModel):
+        font.is_selected = not font.is_selected
+
+        if font.is_selected:
+            self.selected_fonts[font.family] = font
+        else:
+            self.selected_fonts.pop(font.family, None)
+
+        self.update_selection_actions()
+
+    def clear_selection(self):
+        for font in self.selected_fonts.values():
+            font.is_selected = False
+        self.selected_fonts.clear()
+        self.update_selection_actions()
+
+    def update_selection_actions(self):
+        fonts = self.selected_fonts.values()
+        self.selection_label.set_label(f"{len(self.selected_fonts)} selected")
+        self.install_selected_button.set_sensitive(
+            any(not font.is_app_installed for font in fonts)
+        )
+        self.remove_selected_button.set_sensitive(
+            any(font.is_app_installed for font in fonts)
+        )
+
+    def on_selection_mode_changed(self, *_):
+        if self.selection_mode and self.bottom_sheet_layout.get_open():
+            self.bottom_sheet_layout.set_open(False)
+        self.clear_selection()
+
+    @Gtk.Template.Callback()
+    def on_cancel_selection_clicked(self, _):
+        self.selection_mode = False
+
+    @Gtk.Template.Callback()
+    def on_install_selected_clicked(self, _):
+        fonts = [
+            font
+            for font in self.selected_fonts.values()
+            if not font.is_app_installed and not font.is_installing
+        ]
+        asyncio.create_task(self.install_fonts(fonts))
+
+    @Gtk.Template.Callback()
+    def on_remove_selected_clicked(self, _):
+        fonts = [font for font in self.selected_fonts.values() if font.is_app_installed]
+        asyncio.create_task(self.remove_fonts(fonts))
+
+    async def install_fonts(self, fonts: List[FontModel]):
+        if not fonts:
+            return
+
+        external_count = sum(font.is_external_installed for font in fonts)
+        if external_count:
+            dialog = Adw.AlertDialog(
+                heading="Install Fonts",
+                body=f"{external_count} of the selected fonts are already installed on this computer from another source. This operation may create duplicates.",
+                close_response="cancel",
+            )
+            dialog.add_response("cancel", "Cancel")
+            dialog.add_response("install", "Install")
+            dialog.set_response_appearance(
+                "install", Adw.ResponseAppearance.DESTRUCTIVE
+            )
+
+            response = await dialog.choose(self.get_root(), None)  # type: ignore
+            if response != "install":
+                return
+
+        self.selection_mode = False
+        failures = await self.fonts_manager.install_fonts(fonts)
+        self.show_batch_result(len(fonts), failures, "installed")
+
+    async def remove_fonts(self, fonts: List[FontModel]):
+        if not fonts:
+            return
+
+        self.selection_mode = False
+        failures = await self.fonts_manager.remove_fonts(fonts)
+        self.show_batch_result(len(fonts), failures, "removed")
+
+    def show_batch_result(self, count: int, failures: Dict[str, Exception], done: str):
+        if not failures:
+            self.emit("show-toast", f"{count} fonts {done}.")
+            return
+
+        family, error = next(iter(failures.items()))
+        self.emit(
+            "show-toast",
+            f"{count - len(failures)} of {count} fonts {done}. {family}: {error}",
+        )
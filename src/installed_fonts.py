@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from gi.repository import GLib
+from typing_extensions import Dict, Iterator, List, Tuple
+
+
+def write_atomic(path: Path, text: str):
+    # Readers see either the old or the new file, never a half written one
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(f.name, path)
+
+
+class InstalledFonts(Mapping):
+    """Fonts installed by the app, as family -> directory in the user font dir.
+
+    installed.json holds a snapshot and every change after it is appended
+    to a journal next to it, so a change costs one line instead of a full
+    rewrite. Changes are collected for a short while and written on a
+    worker thread, the snapshot is rewritten once the journal gets long.
+    """
+
+    # ms, bursts of changes within this window are written together
+    WRITE_DELAY = 500
+    MAX_JOURNAL_ENTRIES = 512
+
+    def __init__(self, path: Path, font_dir: Path):
+        self.path = path
+        self.journal_path = path.with_name(f"{path.name}.journal")
+
+        self.families: Dict[str, str] = {}
+        self.dirs: Dict[str, str] = {}
+
+        self.pending: List[Tuple[str, str | None]] = []
+        self.journal_entries = 0
+        self.write_source_id = None
+        self.write_future = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        self.load(font_dir)
+
+    def load(self, font_dir: Path):
+        try:
+            self.families = json.loads(self.path.read_text())
+        except Exception:
+            self.families = {}
+
+        try:
+            journal = self.journal_path.read_text().splitlines()
+        except FileNotFoundError:
+            journal = []
+
+        for line in journal:
+            try:
+                family, dir_name = json.loads(line)
+            except ValueError:
+                # torn last line from a crash mid append
+                continue
+
+            if dir_name is None:
+                self.families.pop(family, None)
+            else:
+                self.families[family] = dir_name
+
+        # One directory listing instead of a stat per installed family
+        try:
+            font_dirs = {entry.name for entry in os.scandir(font_dir) if entry.is_dir()}
+        except FileNotFoundError:
+            font_dirs = set()
+
+        installed = {
+            family: dir_name
+            for family, dir_name in self.families.items()
+            if dir_name in font_dirs
+        }
+
+        if journal or len(installed) != len(self.families):
+            self.families = installed
+            self.write_snapshot(dict(installed))
+
+        self.dirs = {dir_name: family for family, dir_name in self.families.items()}
+
+    def __getitem__(self, family: str) -> str:
+        return self.families[family]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.families)
+
+    def __len__(self) -> int:
+        return len(self.families)
+
+    def get_family(self, dir_name: str) -> str | None:
+        return self.dirs.get(dir_name)
+
+    def add(self, family: str, dir_name: str):
+        old_dir_name = self.families.get(family)
+        if old_dir_name is not None:
+            self.dirs.pop(old_dir_name, None)
+
+        self.families[family] = dir_name
+        self.dirs[dir_name] = family
+        self.record(family, dir_name)
+
+    def remove(self, family: str):
+        dir_name = self.families.pop(family, None)
+        if dir_name is None:
+            return
+
+        self.dirs.pop(dir_name, None)
+        self.record(family, None)
+
+    def record(self, family: str, dir_name: str | None):
+        self.pending.append((family, dir_name))
+
+        if self.write_source_id is None:
+            self.write_source_id = GLib.timeout_add(
+                self.WRITE_DELAY, self.on_write_timeout
+            )
+
+    def on_write_timeout(self):
+        self.write_source_id = None
+        self.submit_write()
+        return GLib.SOURCE_REMOVE
+
+    def take_pending(self):
+        entries = self.pending
+        self.pending = []
+        self.journal_entries += len(entries)
+
+        if self.journal_entries > self.MAX_JOURNAL_ENTRIES:
+            self.journal_entries = 0
+            return self.write_snapshot, dict(self.families)
+
+        return self.write_journal, entries
+
+    def submit_write(self):
+        if self.pending:
+            self.write_future = self.executor.submit(*self.take_pending())
+
+    def flush(self):
+        """Write pending changes on the calling thread, for app shutdown."""
+        if self.write_source_id is not None:
+            GLib.source_remove(self.write_source_id)
+            self.write_source_id = None
+
+        # keep the order of writes already handed to the worker
+        if self.write_future is not None:
+            self.write_future.result()
+            self.write_future = None
+
+        if self.pending:
+            write, data = self.take_pending()
+            write(data)
+
+    def write_journal(self, entries: List[Tuple[str, str | None]]):
+        with open(self.journal_path, "a") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_snapshot(self, families: Dict[str, str]):
+        write_atomic(self.path, json.dumps(families, indent=2))
+        # the snapshot already has every journaled change
+        self.journal_path.unlink(missing_ok=True)
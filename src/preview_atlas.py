@@ -0,0 +1,191 @@
+import mmap
+import os
+import struct
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+
+import cairo
+from gi.repository import Gdk, GLib, Pango, PangoCairo
+from typing_extensions import Dict, List, Tuple
+
+MAGIC = b"LIPA"
+VERSION = 1
+
+# Live text is used for the preview sizes in between
+ATLAS_SIZES = (15, 20, 25)
+# Rows clip the preview, so there is no point in rendering more than this
+MAX_WIDTH = 960
+
+HEADER = struct.Struct("<4sHHHxxII")
+ENTRY = struct.Struct("<IHHI")
+
+
+class PreviewAtlas:
+    """Pre-rendered preview strings for one preview size.
+
+    Every preview is stored as an A8 alpha mask, so rows can tint it with
+    the current text color. The file is memory-mapped and previews are only
+    copied out when a row shows them.
+    """
+
+    TEXTURE_CACHE_SIZE = 256
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.size, self.scale, count, index_offset = HEADER.unpack_from(
+            self.buffer, 0
+        )
+
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a preview atlas")
+        if version != VERSION:
+            raise ValueError(f"Unsupported preview atlas version {version}")
+
+        self.entries: Dict[str, Tuple[int, int, int, int]] = {}
+
+        offset = index_offset
+        for _ in range(count):
+            name_length = self.buffer[offset]
+            name = self.buffer[offset + 1 : offset + 1 + name_length].decode("utf-8")
+            offset += 1 + name_length
+
+            self.entries[name] = ENTRY.unpack_from(self.buffer, offset)
+            offset += ENTRY.size
+
+        self.textures: OrderedDict[str, Gdk.Texture] = OrderedDict()
+
+    def covers(self, preview_families: List[str]) -> bool:
+        return all(family in self.entries for family in preview_families)
+
+    def has_preview(self, preview_family: str) -> bool:
+        entry = self.entries.get(preview_family)
+        return entry is not None and entry[1] > 0
+
+    def get_texture(self, preview_family: str) -> Gdk.Texture | None:
+        if preview_family in self.textures:
+            self.textures.move_to_end(preview_family)
+            return self.textures[preview_family]
+
+        if not self.has_preview(preview_family):
+            return None
+
+        offset, width, height, stride = self.entries[preview_family]
+        start = HEADER.size + offset
+        texture = Gdk.MemoryTexture.new(
+            width,
+            height,
+            Gdk.MemoryFormat.A8,
+            GLib.Bytes.new(self.buffer[start : start + stride * height]),
+            stride,
+        )
+
+        self.textures[preview_family] = texture
+        if len(self.textures) > self.TEXTURE_CACHE_SIZE:
+            self.textures.popitem(last=False)
+
+        return texture
+
+
+def render_preview(
+    context: Pango.Context, preview_family: str, text: str, size: int, scale: int
+) -> cairo.ImageSurface | None:
+    desc = Pango.FontDescription()
+    desc.set_family(preview_family)
+    desc.set_size(size * Pango.SCALE)
+    attr_list = Pango.AttrList()
+    attr_list.insert(Pango.attr_fallback_new(False))
+
+    layout = Pango.Layout.new(context)
+    layout.set_font_description(desc)
+    layout.set_attributes(attr_list)
+    layout.set_text(text, -1)
+
+    _, logical = layout.get_pixel_extents()
+    width = min(logical.width, MAX_WIDTH)
+    if width <= 0 or logical.height <= 0:
+        return None
+
+    surface = cairo.ImageSurface(cairo.FORMAT_A8, width * scale, logical.height * scale)
+    cr = cairo.Context(surface)
+    cr.scale(scale, scale)
+    cr.move_to(-logical.x, -logical.y)
+    PangoCairo.show_layout(cr, layout)
+    surface.flush()
+
+    return surface
+
+
+def build_atlas(
+    path: Path,
+    size: int,
+    scale: int,
+    font_files: List[Path],
+    previews: List[Tuple[str, str]],
+):
+    # A private font map, this runs off the main thread
+    font_map = PangoCairo.FontMap.new()
+    for font_file in font_files:
+        font_map.add_font_file(str(font_file))
+
+    context = font_map.create_context()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Written to a temp file first, a half written atlas would be unreadable
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as f:
+        # header | pixel data | index, the header is filled in at the end
+        f.write(bytes(HEADER.size))
+
+        index = bytearray()
+        data_size = 0
+
+        for preview_family, text in previews:
+            surface = render_preview(context, preview_family, text, size, scale)
+
+            name = preview_family.encode("utf-8")
+            index += bytes([len(name)]) + name
+
+            # Empty entries are kept, so the atlas still covers the catalog
+            if surface is None:
+                index += ENTRY.pack(0, 0, 0, 0)
+                continue
+
+            index += ENTRY.pack(
+                data_size,
+                surface.get_width(),
+                surface.get_height(),
+                surface.get_stride(),
+            )
+            pixels = surface.get_data()
+            f.write(pixels)
+            data_size += len(pixels)
+
+        f.write(index)
+        f.seek(0)
+        f.write(
+            HEADER.pack(
+                MAGIC, VERSION, size, scale, len(previews), HEADER.size + data_size
+            )
+        )
+
+    os.replace(f.name, path)
+
+
+def load_or_build_atlas(
+    path: Path,
+    size: int,
+    scale: int,
+    font_files: List[Path],
+    previews: List[Tuple[str, str]],
+) -> PreviewAtlas:
+    try:
+        atlas = PreviewAtlas(path)
+        if atlas.covers([preview_family for preview_family, _ in previews]):
+            return atlas
+    except Exception:
+        pass
+
+    build_atlas(path, size, scale, font_files, previews)
+    return PreviewAtlas(path)
@@ -0,0 +1,241 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+from typing_extensions import Any, Dict, Iterator, List, Set, Tuple
+
+# How much a token match counts towards the rank, per field
+RANKED_FIELDS = (
+    ("display_name", 1.0),
+    ("family", 0.9),
+    ("designer", 0.6),
+    ("subsets", 0.4),
+    ("license", 0.3),
+)
+# Shorter tokens get too many false positives with one typo allowed
+MIN_FUZZY_LENGTH = 4
+
+
+def normalize(text: str) -> str:
+    # Case and accent insensitive, so "hebrew" matches "Hébrew"
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def get_trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", normalize(text))
+
+
+def get_deletes(token: str) -> Set[str]:
+    return {token[:i] + token[i + 1 :] for i in range(len(token))}
+
+
+def is_one_edit_apart(a: str, b: str) -> bool:
+    # Optimal string alignment distance of 1, a swap of adjacent letters is one typo
+    if len(a) > len(b):
+        a, b = b, a
+
+    if len(b) - len(a) > 1:
+        return False
+
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diffs) == 1 or (
+            len(diffs) == 2
+            and diffs[1] == diffs[0] + 1
+            and a[diffs[0]] == b[diffs[1]]
+            and a[diffs[1]] == b[diffs[0]]
+        )
+
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1 :]
+
+
+def bits_from_positions(positions: Iterator[int]) -> int:
+    bits = 0
+    for pos in positions:
+        bits |= 1 << pos
+    return bits
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    while bits:
+        low_bit = bits & -bits
+        yield low_bit.bit_length() - 1
+        bits ^= low_bit
+
+
+class SearchIndex:
+    """Font lookup tables built once from the catalog.
+
+    Sets of fonts are stored as int bitsets, where bit n is the font at
+    position n in the catalog.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.positions: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.trigram_postings: Dict[str, int] = {}
+        self.designer_postings: Dict[str, int] = {}
+        self.category_bits: Dict[str, int] = {}
+        self.subset_bits: Dict[str, int] = {}
+        self.all_bits = (1 << len(records)) - 1
+
+        # For ranked search
+        self.token_weights: Dict[str, Dict[int, float]] = {}
+        self.display_names: List[str] = []
+        self.initials: List[str] = []
+
+        for pos, record in enumerate(records):
+            bit = 1 << pos
+            self.positions[record["family"]] = pos
+
+            name = f"{normalize(record['display_name'])}\n{normalize(record['family'])}"
+            self.names.append(name)
+
+            for trigram in get_trigrams(name):
+                self.trigram_postings[trigram] = (
+                    self.trigram_postings.get(trigram, 0) | bit
+                )
+
+            for token in normalize(record["designer"]).replace(",", " ").split():
+                self.designer_postings[token] = (
+                    self.designer_postings.get(token, 0) | bit
+                )
+
+            for category in record["category"]:
+                self.category_bits[category] = self.category_bits.get(category, 0) | bit
+
+            for subset in record["subsets"]:
+                self.subset_bits[subset] = self.subset_bits.get(subset, 0) | bit
+
+            for field, weight in RANKED_FIELDS:
+                value = record[field]
+                text = " ".join(value) if isinstance(value, list) else value
+
+                for token in tokenize(text):
+                    postings = self.token_weights.setdefault(token, {})
+                    if postings.get(pos, 0) < weight:
+                        postings[pos] = weight
+
+            name_tokens = tokenize(record["display_name"])
+            self.display_names.append(" ".join(name_tokens))
+            self.initials.append("".join(token[0] for token in name_tokens))
+
+        self.sorted_tokens = sorted(self.token_weights)
+
+        # Every token is stored under itself and its single deletions, so tokens
+        # one typo apart from a query share at least one key with it
+        self.typo_candidates: Dict[str, List[str]] = {}
+        for token in self.sorted_tokens:
+            if len(token) < MIN_FUZZY_LENGTH - 1:
+                continue
+            for key in get_deletes(token) | {token}:
+                self.typo_candidates.setdefault(key, []).append(token)
+
+    def search(self, query: str) -> int:
+        query = normalize(query).strip()
+        if not query:
+            return self.all_bits
+
+        candidates = self.all_bits
+        for trigram in get_trigrams(query):
+            candidates &= self.trigram_postings.get(trigram, 0)
+
+        # trigrams can match out of order, so confirm the substring
+        matches = 0
+        for pos in iter_bits(candidates):
+            if query in self.names[pos]:
+                matches |= 1 << pos
+
+        for token, bits in self.designer_postings.items():
+            if token.startswith(query):
+                matches |= bits
+
+        return matches
+
+    def filter(self, query: str, category: str, subset: str) -> int:
+        return self.restrict(self.search(query), category, subset)
+
+    def restrict(self, matches: int, category: str, subset: str) -> int:
+        if category != "All":
+            matches &= self.category_bits.get(category, 0)
+
+        if subset != "All":
+            matches &= self.subset_bits.get(subset, 0)
+
+        return matches
+
+    def match_token(self, token: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+
+        def add(vocab_token: str, quality: float):
+            for pos, weight in self.token_weights[vocab_token].items():
+                score = weight * quality
+                if score > scores.get(pos, 0):
+                    scores[pos] = score
+
+        # exact and prefix matches are adjacent in the sorted vocabulary
+        for i in range(bisect_left(self.sorted_tokens, token), len(self.sorted_tokens)):
+            vocab_token = self.sorted_tokens[i]
+            if not vocab_token.startswith(token):
+                break
+            add(vocab_token, 1.0 if vocab_token == token else 0.8)
+
+        if len(token) >= MIN_FUZZY_LENGTH:
+            candidates: Set[str] = set()
+            for key in get_deletes(token) | {token}:
+                candidates.update(self.typo_candidates.get(key, ()))
+
+            for candidate in candidates:
+                if candidate != token and is_one_edit_apart(token, candidate):
+                    add(candidate, 0.5)
+
+        return scores
+
+    def rank(self, query: str) -> Dict[int, float]:
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+
+        # every query token has to match some field of the font
+        scores = self.match_token(tokens[0])
+        for token in tokens[1:]:
+            token_scores = self.match_token(token)
+            scores = {
+                pos: score + token_scores[pos]
+                for pos, score in scores.items()
+                if pos in token_scores
+            }
+
+        query = " ".join(tokens)
+
+        if len(tokens) == 1 and len(query) >= 2:
+            for pos, initials in enumerate(self.initials):
+                if initials.startswith(query):
+                    scores[pos] = scores.get(pos, 0) + 0.7
+
+        for pos in scores:
+            name = self.display_names[pos]
+            if name == query:
+                scores[pos] += 2
+            elif name.startswith(query):
+                scores[pos] += 1
+
+        return scores
+
+    def match(
+        self, query: str, category: str, subset: str, ranked: bool
+    ) -> Tuple[int, Dict[int, float]]:
+        if ranked and query.strip():
+            scores = self.rank(query)
+            matches = bits_from_positions(iter(scores))
+            return self.restrict(matches, category, subset), scores
+
+        return self.filter(query, category, subset), {}
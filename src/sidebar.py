@@ -1,4 +1,4 @@
-from gi.repository import Adw, GObject, Gtk
+from gi.repository import Adw, Gio, GObject, Gtk
 
 from .filters import Filters
 from .fonts_manager import FontsManager
@@ -13,7 +13,10 @@ class Sidebar(Adw.PreferencesPage):
     category_combo: Adw.ComboRow = Gtk.Template.Child()
     subset_combo: Adw.ComboRow = Gtk.Template.Child()
     installed_switch: Adw.SwitchRow = Gtk.Template.Child()
+    fuzzy_search_switch: Adw.SwitchRow = Gtk.Template.Child()
     preview_size_adjustment: Gtk.Adjustment = Gtk.Template.Child()
+    preview_atlas_switch: Adw.SwitchRow = Gtk.Template.Child()
+    prefer_variable_switch: Adw.SwitchRow = Gtk.Template.Child()
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -56,9 +59,42 @@ class Sidebar(Adw.PreferencesPage):
             GObject.BindingFlags.BIDIRECTIONAL | GObject.BindingFlags.SYNC_CREATE,
         )
 
+        filters.bind_property(
+            "fuzzy_search",
+            self.fuzzy_search_switch,
+            "active",
+            GObject.BindingFlags.BIDIRECTIONAL | GObject.BindingFlags.SYNC_CREATE,
+        )
+
         filters.bind_property(
             "preview_size",
             self.preview_size_adjustment,
             "value",
             GObject.BindingFlags.BIDIRECTIONAL | GObject.BindingFlags.SYNC_CREATE,
         )
+
+        self.settings = Gio.Settings.new(fonts_manager.APP_ID)
+        self.settings.bind(
+            "preview-atlas", filters, "preview_atlas", Gio.SettingsBindFlags.DEFAULT
+        )
+
+        filters.bind_property(
+            "preview_atlas",
+            self.preview_atlas_switch,
+            "active",
+            GObject.BindingFlags.BIDIRECTIONAL | GObject.BindingFlags.SYNC_CREATE,
+        )
+
+        self.settings.bind(
+            "prefer-variable",
+            filters,
+            "prefer_variable",
+            Gio.SettingsBindFlags.DEFAULT,
+        )
+
+        filters.bind_property(
+            "prefer_variable",
+            self.prefer_variable_switch,
+            "active",
+            GObject.BindingFlags.BIDIRECTIONAL | GObject.BindingFlags.SYNC_CREATE,
+        )
@@ -1,23 +1,94 @@
 import asyncio
-from typing import List, Set, Tuple
+from contextlib import aclosing
+from functools import lru_cache
+from typing import Any, Dict, List, Set, cast
 
-from gi.repository import Adw, GLib, GObject, Gtk, Pango
+from gi.repository import Adw, Gio, GLib, GObject, Gtk, Pango
 
 from .font_model import FontModel
 from .fonts_manager import FontFace, FontsManager
 
+AXIS_NAMES = {
+    "wght": "Weight",
+    "wdth": "Width",
+    "slnt": "Slant",
+    "ital": "Italic",
+    "opsz": "Optical Size",
+    "GRAD": "Grade",
+}
+# Where the sliders start, clamped to the range of the axis
+AXIS_DEFAULTS = {"wght": 400, "wdth": 100, "slnt": 0, "ital": 0, "GRAD": 0}
+
+
+# Shared by every face row, so typing doesn't rebuild the same attributes
+@lru_cache(maxsize=512)
+def get_face_attributes(
+    desc: str, size: int, is_fallback: bool, variations: str
+) -> Pango.AttrList:
+    face_desc = Pango.FontDescription.from_string(desc)
+    face_desc.set_size(size * Pango.SCALE)
+    if variations:
+        face_desc.set_variations(variations)
+
+    attr_list = Pango.AttrList()
+    attr_list.insert(Pango.attr_font_desc_new(face_desc))
+    attr_list.insert(Pango.attr_fallback_new(is_fallback))
+    return attr_list
+
+
+class TestFace(GObject.Object):
+    __gtype_name__ = "TestFace"
+
+    label = GObject.Property(type=str)
+
+    def __init__(self, face: FontFace, label: str):
+        super().__init__(label=label)
+        self.desc = face["desc"].to_string()
+        self.weight = face["weight"]
+        self.style = face["style"]
+
+
+class TestFaceRow(Gtk.Box):
+    __gtype_name__ = "TestFaceRow"
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            orientation=Gtk.Orientation.VERTICAL,
+            spacing=26,
+            margin_top=18,
+            margin_bottom=18,
+            margin_start=18,
+            margin_end=18,
+            **kwargs,
+        )
+
+        self.face: TestFace | None = None
+
+        self.style_label = Gtk.Label(
+            halign=Gtk.Align.START, css_classes=["caption", "dimmed"]
+        )
+        self.preview_label = Gtk.Label(wrap=True, xalign=0)
+
+        self.append(self.style_label)
+        self.append(self.preview_label)
+
 
 @Gtk.Template(resource_path="/io/github/shonebinu/Glyph/test-font.ui")
 class TestFont(Adw.Bin):
     __gtype_name__ = "TestFont"
 
+    # Typing into longer text is applied in batches
+    LONG_TEXT_LENGTH = 80
+    TEXT_DEBOUNCE_MS = 120
+
     font_model = GObject.Property(type=FontModel)
 
     test_view_stack: Adw.ViewStack = Gtk.Template.Child()
-    faces_container: Gtk.Box = Gtk.Template.Child()
+    faces_list_view: Gtk.ListView = Gtk.Template.Child()
     preview_text_entry_row: Adw.EntryRow = Gtk.Template.Child()
     preview_size_adjustment: Gtk.Adjustment = Gtk.Template.Child()
     preview_fallback_switch: Adw.SwitchRow = Gtk.Template.Child()
+    axes_list: Gtk.ListBox = Gtk.Template.Child()
 
     @GObject.Signal(arg_types=(str,))
     def show_toast(self, msg: str):
@@ -30,7 +101,26 @@ class TestFont(Adw.Bin):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        self.preview_label_widgets: Set[Tuple[Gtk.Label, Pango.FontDescription]] = set()
+        # Faces arrive file by file and are kept sorted by weight and style
+        self.faces_store = Gio.ListStore.new(TestFace)
+        self.faces_list_view.set_model(Gtk.NoSelection.new(self.faces_store))
+        self.face_styles: Set[int] = set()
+
+        # Only rows on screen are updated, the rest pick it up when bound
+        self.bound_rows: Set[TestFaceRow] = set()
+        self.font_map: Pango.FontMap | None = None
+        self.preview_text = ""
+        self.font_size = 20
+        self.is_fallback = False
+        self.variations = ""
+
+        self.text_source_id = None
+
+        # A newer font replaces the one still loading
+        self.test_generation = 0
+
+        # Set while testing variable files, one slider per axis
+        self.axis_values: Dict[str, float] = {}
 
     def set_fonts_manager(self, fonts_manager: FontsManager):
         self.fonts_manager = fonts_manager
@@ -40,67 +130,162 @@ class TestFont(Adw.Bin):
         self.font_model = font_model
 
         self.preview_text_entry_row.set_text(font_model.preview_string)
+        self.setup_axes(font_model)
+
+        self.test_generation += 1
+        asyncio.create_task(self.setup_for_test(self.test_generation))
 
-        asyncio.create_task(self.setup_for_test())
+    async def setup_for_test(self, generation: int):
+        self.clear_faces_container()
 
-    async def setup_for_test(self):
         try:
-            (
-                current_font_map,
-                current_faces,
-            ) = await self.fonts_manager.download_font_for_test(self.font_model)
+            async with aclosing(
+                self.fonts_manager.stream_font_for_test(self.font_model)
+            ) as faces_stream:
+                async for font_map, faces in faces_stream:
+                    if generation != self.test_generation:
+                        return
 
-            self.populate_faces_container(current_font_map, current_faces)
-            self.refresh_preview()
-            self.test_view_stack.set_visible_child_name("main_view")
+                    self.add_faces(font_map, faces)
+                    self.refresh_preview()
+                    self.test_view_stack.set_visible_child_name("main_view")
 
         except Exception as e:
+            if generation != self.test_generation:
+                return
+
             self.emit("show-toast", str(e))
-            # Add a timeout so that instant flashing does not happen
-            GLib.timeout_add_seconds(2, self.emit, "exit-page")
+
+            # the faces that did load can still be tested
+            if self.faces_store.get_n_items() == 0:
+                # Add a timeout so that instant flashing does not happen
+                GLib.timeout_add_seconds(2, self.emit, "exit-page")
+
+    def setup_axes(self, font_model: FontModel):
+        self.axes_list.remove_all()
+        self.axis_values = {}
+
+        files = font_model.get_files(self.fonts_manager.prefer_variable)
+        if files is not font_model.variable_files:
+            self.axes_list.set_visible(False)
+            return
+
+        for axis in font_model.axes:
+            self.axes_list.append(self.create_axis_row(axis))
+
+        self.axes_list.set_visible(bool(self.axis_values))
+
+    def create_axis_row(self, axis: Dict[str, Any]) -> Adw.ActionRow:
+        tag, min_value, max_value = axis["tag"], axis["min"], axis["max"]
+        value = min(max(AXIS_DEFAULTS.get(tag, min_value), min_value), max_value)
+        self.axis_values[tag] = value
+
+        # small ranges like slant need fractions
+        fine = max_value - min_value <= 20
+        scale = Gtk.Scale.new_with_range(
+            Gtk.Orientation.HORIZONTAL, min_value, max_value, 0.1 if fine else 1
+        )
+        scale.set_hexpand(True)
+        scale.set_draw_value(True)
+        scale.set_value_pos(Gtk.PositionType.RIGHT)
+        scale.set_digits(1 if fine else 0)
+        scale.set_value(value)
+        scale.connect("value-changed", self.on_axis_changed, tag)
+
+        row = Adw.ActionRow(title=AXIS_NAMES.get(tag, tag))
+        row.add_suffix(scale)
+        return row
+
+    def on_axis_changed(self, scale: Gtk.Scale, tag: str):
+        self.axis_values[tag] = scale.get_value()
+        self.refresh_preview()
 
     def clear_faces_container(self):
-        child = self.faces_container.get_first_child()
-        while child:
-            self.faces_container.remove(child)
-            child = self.faces_container.get_first_child()
+        self.faces_store.remove_all()
+        self.face_styles.clear()
 
-        self.preview_label_widgets.clear()
+    def add_faces(self, fontmap: Pango.FontMap, faces: List[FontFace]):
+        self.font_map = fontmap
 
-    def populate_faces_container(self, fontmap: Pango.FontMap, faces: List[FontFace]):
-        self.clear_faces_container()
+        if self.axis_values:
+            # The sliders replace the named instances, one face per style is enough
+            picked_faces: List[FontFace] = []
+            for face in sorted(faces, key=lambda face: abs(face["weight"] - 400)):
+                if face["style"] not in self.face_styles:
+                    self.face_styles.add(face["style"])
+                    picked_faces.append(face)
+            faces = picked_faces
 
         for face in faces:
-            face_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=26)
-
-            style_label = Gtk.Label(
-                label=f"{face['name']} {face['weight']}",
-                halign=Gtk.Align.START,
-                css_classes=["caption", "dimmed"],
+            self.face_styles.add(face["style"])
+            label = (
+                face["name"] if self.axis_values else f"{face['name']} {face['weight']}"
             )
+            self.faces_store.insert_sorted(TestFace(face, label), self.compare_faces)
+
+    def compare_faces(self, face_a: TestFace, face_b: TestFace, *_) -> int:
+        key_a = (face_a.weight, face_a.style)
+        key_b = (face_b.weight, face_b.style)
+        return (key_a > key_b) - (key_a < key_b)
+
+    @Gtk.Template.Callback()
+    def on_face_factory_setup(self, _, list_item: Gtk.ListItem):
+        list_item.set_activatable(False)
+        list_item.set_child(TestFaceRow())
+
+    @Gtk.Template.Callback()
+    def on_face_factory_bind(self, _, list_item: Gtk.ListItem):
+        row = cast(TestFaceRow, list_item.get_child())
+        row.face = cast(TestFace, list_item.get_item())
+        row.style_label.set_label(row.face.label)
+
+        self.update_row(row)
+        self.bound_rows.add(row)
+
+    @Gtk.Template.Callback()
+    def on_face_factory_unbind(self, _, list_item: Gtk.ListItem):
+        self.bound_rows.discard(cast(TestFaceRow, list_item.get_child()))
 
-            preview_label = Gtk.Label(wrap=True, xalign=0)
-            preview_label.set_font_map(fontmap)
+    def update_row(self, row: TestFaceRow):
+        if row.face is None:
+            return
 
-            self.preview_label_widgets.add((preview_label, face["desc"]))
+        attr_list = get_face_attributes(
+            row.face.desc, self.font_size, self.is_fallback, self.variations
+        )
 
-            face_container.append(style_label)
-            face_container.append(preview_label)
+        row.preview_label.set_font_map(self.font_map)
+        row.preview_label.set_attributes(attr_list)
+        row.preview_label.set_label(self.preview_text)
 
-            self.faces_container.append(face_container)
-            self.faces_container.append(Gtk.Separator())
+    @Gtk.Template.Callback()
+    def on_preview_text_changed(self, *_):
+        if self.text_source_id is not None:
+            GLib.source_remove(self.text_source_id)
+            self.text_source_id = None
+
+        # relaying out long wrapped text on every keystroke can't keep up
+        if len(self.preview_text_entry_row.get_text()) < self.LONG_TEXT_LENGTH:
+            self.refresh_preview()
+            return
+
+        self.text_source_id = GLib.timeout_add(
+            self.TEXT_DEBOUNCE_MS, self.on_text_timeout
+        )
+
+    def on_text_timeout(self):
+        self.text_source_id = None
+        self.refresh_preview()
+        return GLib.SOURCE_REMOVE
 
     @Gtk.Template.Callback()
     def refresh_preview(self, *_):
-        preview_text = self.preview_text_entry_row.get_text()
-        font_size = int(self.preview_size_adjustment.get_value())
-        is_fallback = self.preview_fallback_switch.get_active()
-
-        for widget, desc in self.preview_label_widgets:
-            desc.set_size(Pango.SCALE * font_size)
-            attr_list = Pango.AttrList()
-            attr_list.insert(Pango.attr_font_desc_new(desc))
-            attr_list.insert(Pango.attr_fallback_new(is_fallback))
-
-            widget.set_attributes(attr_list)
-            widget.set_label(preview_text)
+        self.preview_text = self.preview_text_entry_row.get_text()
+        self.font_size = int(self.preview_size_adjustment.get_value())
+        self.is_fallback = self.preview_fallback_switch.get_active()
+        self.variations = ",".join(
+            f"{tag}={value:g}" for tag, value in self.axis_values.items()
+        )
+
+        for row in self.bound_rows:
+            self.update_row(row)
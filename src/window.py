@@ -25,6 +25,7 @@ class LipiWindow(Adw.ApplicationWindow):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
+        self.fonts_view.connect("show-toast", self.on_show_toast)
         self.fonts_view.sheet_view.connect("show-toast", self.on_show_toast)
         self.test_font.connect("show-toast", self.on_show_toast)
         self.test_font.connect("exit-page", self.on_exit_test_font_page)
@@ -36,15 +37,25 @@ class LipiWindow(Adw.ApplicationWindow):
     async def setup(self):
         try:
             fonts_manager = await asyncio.to_thread(FontsManager)
+            self.get_application().connect(
+                "shutdown", self.on_app_shutdown, fonts_manager
+            )
 
             self.fonts_view.set_fonts_manager(fonts_manager)
             self.sidebar.set_fonts_manager(fonts_manager)
             self.test_font.set_fonts_manager(fonts_manager)
             self.view_stack.set_visible_child_name("main_view")
 
+            # The first batch of fonts is already showing, the rest follow
+            await fonts_manager.populate_font_store()
+
         except Exception as e:
             self.toast_overlay.add_toast(Adw.Toast(title=str(e)))
 
+    def on_app_shutdown(self, _, fonts_manager: FontsManager):
+        # pending installed font changes would be lost otherwise
+        fonts_manager.app_installed_fonts.flush()
+
     @Gtk.Template.Callback()
     def on_search_changed(self, search_entry: Gtk.SearchEntry):
         self.fonts_view.set_search_query(search_entry.get_text())
@@ -0,0 +1,16 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The app is installed as the lipi package, load src under that name
+spec = importlib.util.spec_from_file_location(
+    "lipi", ROOT / "src" / "__init__.py", submodule_search_locations=[str(ROOT / "src")]
+)
+lipi = importlib.util.module_from_spec(spec)
+sys.modules["lipi"] = lipi
+spec.loader.exec_module(lipi)
+
+# for generate_fonts_data
+sys.path.insert(0, str(ROOT))
@@ -0,0 +1,117 @@
+import pytest
+
+from lipi.catalog import Catalog
+
+# write_catalog lives in the generator, which needs the generation deps
+generate_fonts_data = pytest.importorskip("generate_fonts_data", exc_type=ImportError)
+
+RECORDS = [
+    {
+        "family": "Inter",
+        "display_name": "Inter",
+        "designer": "Rasmus Andersson",
+        "license": "OFL",
+        "category": ["Sans Serif"],
+        "subsets": ["cyrillic", "greek", "latin"],
+        "files": ["https://example.org/Inter[opsz,wght].ttf"],
+        "hashes": ["ab" * 32],
+        "axes": [
+            {"tag": "opsz", "min": 14.0, "max": 32.0},
+            {"tag": "wght", "min": 100.0, "max": 900.0},
+        ],
+        "variable_files": ["https://example.org/Inter[opsz,wght].ttf"],
+        "preview_string": "Inter",
+        "preview_family": "Inter Preview",
+    },
+    {
+        "family": "Lora",
+        "display_name": "Lora",
+        "designer": "Cyreal",
+        "license": "OFL",
+        "category": ["Serif"],
+        "subsets": ["latin", "vietnamese"],
+        "files": [
+            "https://example.org/Lora-Regular.ttf",
+            "https://example.org/Lora-Bold.ttf",
+        ],
+        # hashes are optional, older indexes have none
+        "hashes": ["", ""],
+        "axes": [],
+        "variable_files": [],
+        "preview_string": "Lora",
+        "preview_family": "Lora Preview",
+    },
+    {
+        "family": "Noto Sans Hebrew",
+        "display_name": "Noto Sans Hébrew",
+        "designer": "Google",
+        "license": "OFL",
+        "category": ["Sans Serif", "Display"],
+        "subsets": ["hebrew", "latin"],
+        "files": ["https://example.org/NotoSansHebrew-Regular.ttf"],
+        "hashes": ["cd" * 32],
+        "axes": [],
+        "variable_files": [],
+        "preview_string": "אבג",
+        "preview_family": "Noto Sans Hebrew Preview",
+    },
+]
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    path = tmp_path / "fonts.bin"
+    generate_fonts_data.write_catalog(RECORDS, path)
+    return path
+
+
+def test_round_trip(catalog_path):
+    with Catalog(catalog_path) as catalog:
+        assert len(catalog) == len(RECORDS)
+        assert [dict(record) for record in catalog] == RECORDS
+        assert catalog.categories == ["Display", "Sans Serif", "Serif"]
+        assert catalog.subsets == ["cyrillic", "greek", "hebrew", "latin", "vietnamese"]
+
+
+def test_indexing(catalog_path):
+    with Catalog(catalog_path) as catalog:
+        assert catalog[-1]["family"] == "Noto Sans Hebrew"
+        assert [record["family"] for record in catalog[:2]] == ["Inter", "Lora"]
+
+        with pytest.raises(IndexError):
+            catalog[len(RECORDS)]
+
+
+def test_fields_decode_on_access(catalog_path):
+    with Catalog(catalog_path) as catalog:
+        record = catalog[0]
+        assert record.fields == {}
+
+        assert record["designer"] == "Rasmus Andersson"
+        assert list(record.fields) == ["designer"]
+        assert record.get("missing") is None
+
+
+def test_strings_are_shared(catalog_path):
+    with Catalog(catalog_path) as catalog:
+        assert catalog[0]["license"] is catalog[1]["license"]
+
+
+def test_close(catalog_path):
+    catalog = Catalog(catalog_path)
+    record = catalog[1]
+    family = record["family"]
+    catalog.close()
+
+    # decoded fields stay readable, the rest needs the mapped file
+    assert record["family"] == family
+    with pytest.raises(ValueError):
+        record["files"]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "fonts.bin"
+    path.write_bytes(b"\0" * 64)
+
+    with pytest.raises(ValueError):
+        Catalog(path)
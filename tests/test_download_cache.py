@@ -0,0 +1,127 @@
+import asyncio
+import os
+
+from lipi import download_cache
+from lipi.download_cache import DownloadCache, link_or_copy
+
+URL = "https://example.org/fonts/{}.ttf"
+
+
+def fetch_all(cache: DownloadCache, names, size=100):
+    downloads = []
+
+    async def download(url, path):
+        downloads.append(url)
+        path.write_bytes(b"x" * size)
+
+    async def run():
+        for name in names:
+            await cache.fetch(URL.format(name), download)
+
+    asyncio.run(run())
+    return downloads
+
+
+def set_mtime(cache: DownloadCache, name: str, mtime: float):
+    os.utime(cache.get_path(URL.format(name)), (mtime, mtime))
+
+
+def cached(cache: DownloadCache, names):
+    return [name for name in names if cache.get_path(URL.format(name)).exists()]
+
+
+def test_fetch_downloads_once(tmp_path):
+    cache = DownloadCache(tmp_path, 1000)
+
+    assert fetch_all(cache, ["a", "a", "b"]) == [URL.format("a"), URL.format("b")]
+    assert cache.get_path(URL.format("a")).suffix == ".ttf"
+    assert cache.stats() == {"hits": 1, "misses": 2, "files": 2, "bytes": 200}
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DownloadCache(tmp_path, 250)
+    fetch_all(cache, ["a", "b"])
+    set_mtime(cache, "a", 2000)
+    set_mtime(cache, "b", 1000)
+
+    # a third file goes over the limit, b was used longest ago
+    fetch_all(cache, ["c"])
+    assert cached(cache, ["a", "b", "c"]) == ["a", "c"]
+
+
+def test_hits_refresh_recency(tmp_path):
+    cache = DownloadCache(tmp_path, 250)
+    fetch_all(cache, ["a", "b"])
+    set_mtime(cache, "a", 1000)
+    set_mtime(cache, "b", 2000)
+
+    fetch_all(cache, ["a", "c"])
+    assert cached(cache, ["a", "b", "c"]) == ["a", "c"]
+
+
+def test_evict_skips_pinned(tmp_path):
+    cache = DownloadCache(tmp_path, 250)
+    fetch_all(cache, ["a", "b"])
+    set_mtime(cache, "a", 1000)
+    set_mtime(cache, "b", 2000)
+
+    path = cache.get_path(URL.format("a"))
+    cache.pin(path)
+    fetch_all(cache, ["c"])
+    assert cached(cache, ["a", "b", "c"]) == ["a", "c"]
+
+    cache.unpin(path)
+    fetch_all(cache, ["d"])
+    assert cached(cache, ["a", "c", "d"]) == ["c", "d"]
+
+
+def test_evict_skips_files_removed_meanwhile(tmp_path, monkeypatch):
+    cache = DownloadCache(tmp_path, 1000)
+    fetch_all(cache, ["a", "b"])
+
+    # another worker moves or removes a file between listing and stat
+    entries = list(os.scandir(tmp_path))
+    cache.get_path(URL.format("a")).unlink()
+    monkeypatch.setattr(download_cache.os, "scandir", lambda path: iter(entries))
+
+    cache.max_bytes = 0
+    cache.evict(set())
+    assert cached(cache, ["a", "b"]) == []
+
+
+def test_evict_removes_old_partial_files(tmp_path):
+    cache = DownloadCache(tmp_path, 1000)
+    old = tmp_path / "old.ttf.part"
+    recent = tmp_path / "recent.ttf.part"
+    old.write_bytes(b"x")
+    recent.write_bytes(b"x")
+    os.utime(old, (0, 0))
+
+    cache.evict(set())
+    assert not old.exists()
+    assert recent.exists()
+
+
+def test_link_or_copy_links_within_a_filesystem(tmp_path):
+    source = tmp_path / "source.ttf"
+    source.write_bytes(b"font data")
+    destination = tmp_path / "destination.ttf"
+
+    link_or_copy(source, destination)
+    assert destination.read_bytes() == b"font data"
+    assert os.path.samefile(source, destination)
+
+
+def test_link_or_copy_copies_across_filesystems(tmp_path, monkeypatch):
+    source = tmp_path / "source.ttf"
+    source.write_bytes(b"font data" * 1000)
+    destination = tmp_path / "destination.ttf"
+
+    def cross_device_link(*args):
+        raise OSError("Invalid cross-device link")
+
+    monkeypatch.setattr(download_cache.os, "link", cross_device_link)
+
+    link_or_copy(source, destination)
+    assert destination.read_bytes() == source.read_bytes()
+    assert not os.path.samefile(source, destination)
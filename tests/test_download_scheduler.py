@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+from lipi.download_scheduler import DownloadScheduler, PrioritySemaphore
+
+BODY = b"font data " * 1000
+
+
+def make_scheduler(handler) -> DownloadScheduler:
+    scheduler = DownloadScheduler(
+        httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    # no need to wait between retries here
+    scheduler.RETRY_BASE_DELAY = 0
+    return scheduler
+
+
+def test_download_verifies_hash(tmp_path):
+    scheduler = make_scheduler(lambda request: httpx.Response(200, content=BODY))
+    path = tmp_path / "font.ttf"
+
+    asyncio.run(
+        scheduler.download(
+            "https://example.org/font.ttf", path, 0, hashlib.sha256(BODY).hexdigest()
+        )
+    )
+    assert path.read_bytes() == BODY
+
+    with pytest.raises(Exception, match="Checksum mismatch"):
+        asyncio.run(
+            scheduler.download("https://example.org/font.ttf", path, 0, "0" * 64)
+        )
+    assert not path.exists()
+
+
+def test_retries_server_errors(tmp_path):
+    statuses = [503, 502, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), content=BODY)
+
+    path = tmp_path / "font.ttf"
+    asyncio.run(
+        make_scheduler(handler).download("https://example.org/font.ttf", path, 0)
+    )
+
+    assert statuses == []
+    assert path.read_bytes() == BODY
+
+
+def test_client_errors_are_not_retried(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(404)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(
+            make_scheduler(handler).download(
+                "https://example.org/font.ttf", tmp_path / "font.ttf", 0
+            )
+        )
+    assert len(requests) == 1
+
+
+def test_resumes_partial_file(tmp_path):
+    path = tmp_path / "font.ttf.part"
+    path.write_bytes(BODY[:1000])
+    headers = []
+
+    def handler(request):
+        headers.append(request.headers)
+        return httpx.Response(206, content=BODY[1000:])
+
+    asyncio.run(
+        make_scheduler(handler).download("https://example.org/font.ttf", path, 0)
+    )
+
+    assert headers[0]["Range"] == "bytes=1000-"
+    # ranges count encoded bytes, so the body has to come unencoded
+    assert headers[0]["Accept-Encoding"] == "identity"
+    assert path.read_bytes() == BODY
+
+
+def test_unsatisfiable_range_keeps_complete_file(tmp_path):
+    # left complete by a crash before it was moved into place
+    path = tmp_path / "font.ttf.part"
+    path.write_bytes(BODY)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(416)
+
+    asyncio.run(
+        make_scheduler(handler).download(
+            "https://example.org/font.ttf", path, 0, hashlib.sha256(BODY).hexdigest()
+        )
+    )
+
+    assert len(requests) == 1
+    assert path.read_bytes() == BODY
+
+
+def test_unsatisfiable_range_restarts_file(tmp_path):
+    path = tmp_path / "font.ttf.part"
+    path.write_bytes(b"stale" * 10000)
+    headers = []
+
+    def handler(request):
+        headers.append(request.headers)
+        if "Range" in request.headers:
+            return httpx.Response(416)
+        return httpx.Response(200, content=BODY)
+
+    asyncio.run(
+        make_scheduler(handler).download(
+            "https://example.org/font.ttf", path, 0, hashlib.sha256(BODY).hexdigest()
+        )
+    )
+
+    assert len(headers) == 2
+    assert "Range" not in headers[1]
+    assert path.read_bytes() == BODY
+
+
+def test_ignored_range_restarts_file(tmp_path):
+    path = tmp_path / "font.ttf.part"
+    path.write_bytes(b"stale")
+
+    scheduler = make_scheduler(lambda request: httpx.Response(200, content=BODY))
+    asyncio.run(scheduler.download("https://example.org/font.ttf", path, 0))
+
+    assert path.read_bytes() == BODY
+
+
+def run_downloads(tmp_path, hosts) -> dict:
+    active = {}
+    peak = {}
+
+    async def handler(request):
+        host = request.url.host
+        active[host] = active.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), active[host])
+        peak["total"] = max(peak.get("total", 0), sum(active.values()))
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200, content=BODY)
+
+    scheduler = make_scheduler(handler)
+
+    async def download_all():
+        await asyncio.gather(
+            *(
+                scheduler.download(
+                    f"https://{host}/{i}.ttf", tmp_path / f"{host}-{i}", 0
+                )
+                for host in hosts
+                for i in range(20)
+            )
+        )
+
+    asyncio.run(download_all())
+    return peak
+
+
+def test_per_host_limit(tmp_path):
+    peak = run_downloads(tmp_path, ["a.example.org"])
+    assert peak["a.example.org"] == DownloadScheduler.MAX_PER_HOST
+
+
+def test_global_limit(tmp_path):
+    hosts = ["a.example.org", "b.example.org", "c.example.org"]
+    peak = run_downloads(tmp_path, hosts)
+
+    assert peak["total"] == DownloadScheduler.MAX_CONCURRENT
+    assert all(peak[host] <= DownloadScheduler.MAX_PER_HOST for host in hosts)
+
+
+def test_priority_semaphore_serves_lower_priority_first():
+    order = []
+
+    async def run():
+        semaphore = PrioritySemaphore(1)
+        await semaphore.acquire(0)
+
+        async def waiter(name, priority):
+            await semaphore.acquire(priority)
+            order.append(name)
+            semaphore.release()
+
+        tasks = [
+            asyncio.create_task(waiter("background", 10)),
+            asyncio.create_task(waiter("rest", 1)),
+            asyncio.create_task(waiter("interactive", 0)),
+        ]
+        # let every waiter queue up before the slot frees
+        await asyncio.sleep(0)
+        semaphore.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert order == ["interactive", "rest", "background"]
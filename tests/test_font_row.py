@@ -0,0 +1,144 @@
+import asyncio
+import os
+
+import pytest
+
+gi = pytest.importorskip("gi")
+gi.require_version("Gtk", "4.0")
+gi.require_version("Adw", "1")
+gi.require_version("PangoCairo", "1.0")
+from gi.repository import Adw, Gio, GLib, Gtk, PangoCairo
+
+# the views are templates, their ui files come from the gresource meson builds
+RESOURCE = os.environ.get("LIPI_GRESOURCE")
+if not RESOURCE or not Gtk.init_check():
+    pytest.skip(
+        "needs a display and the built lipi.gresource in LIPI_GRESOURCE",
+        allow_module_level=True,
+    )
+Adw.init()
+Gio.Resource.load(RESOURCE)._register()
+
+from lipi import fonts_view
+from lipi.filters import Filters
+from lipi.font_model import FontModel
+from lipi.font_row import FontRow
+from lipi.fonts_view import FontsView
+
+FONT_COUNT = 2000
+SCROLL_STEP = 25
+
+
+class CountingFilters(Filters):
+    def __init__(self):
+        super().__init__()
+        self.connections = 0
+
+    def connect(self, *args):
+        self.connections += 1
+        return super().connect(*args)
+
+
+class FakeFontsManager:
+    def __init__(self):
+        self.filters = CountingFilters()
+        self.font_store = Gio.ListStore.new(FontModel)
+        self.custom_font_map = PangoCairo.FontMap.new()
+        self.preview_atlases = {}
+        self.search_index_ready = asyncio.Event()
+
+        for i in range(FONT_COUNT):
+            self.font_store.append(make_model(i))
+
+    def load_preview_font(self, model: FontModel):
+        pass
+
+    def load_preview_fonts(self, models):
+        pass
+
+
+def make_model(i: int) -> FontModel:
+    family = f"Family {i}"
+    return FontModel(
+        {
+            "family": family,
+            "display_name": family,
+            "designer": "Designer",
+            "license": "OFL",
+            "category": ["Sans Serif"],
+            "subsets": ["latin"],
+            "files": [],
+            "preview_string": family,
+            "preview_family": f"{family} Preview",
+        }
+    )
+
+
+def run_main_loop():
+    context = GLib.MainContext.default()
+    # let the list view lay out, bind and unbind its rows
+    for _ in range(100):
+        while context.pending():
+            context.iteration(False)
+
+
+def shown_rows(list_view: Gtk.ListView):
+    rows = set()
+    child = list_view.get_first_child()
+    while child:
+        row = child.get_first_child()
+        if isinstance(row, FontRow):
+            rows.add(row)
+        child = child.get_next_sibling()
+    return rows
+
+
+@pytest.fixture
+def view(monkeypatch):
+    # the search index never becomes ready, nothing awaits the background tasks
+    monkeypatch.setattr(fonts_view.asyncio, "create_task", lambda coro: coro.close())
+
+    view = FontsView()
+    view.set_fonts_manager(FakeFontsManager())
+
+    window = Gtk.Window(default_width=600, default_height=600, child=view)
+    window.present()
+    run_main_loop()
+
+    yield view
+
+    window.destroy()
+    run_main_loop()
+
+
+def test_scrolling_keeps_a_screenful_of_bound_rows(view):
+    filters = view.fonts_manager.filters
+    connections = filters.connections
+
+    viewport = len(view.bound_rows)
+    assert 0 < viewport < 100
+
+    for position in range(0, FONT_COUNT, SCROLL_STEP):
+        view.list_view.scroll_to(position, Gtk.ListScrollFlags.NONE, None)
+        run_main_loop()
+
+        # unbinding drops rows that scrolled out, recycled rows aren't counted twice
+        assert view.bound_rows == shown_rows(view.list_view)
+        assert abs(len(view.bound_rows) - viewport) <= 2
+
+    # recycled rows don't listen to the filters themselves
+    assert filters.connections == connections
+
+
+def test_preview_size_updates_each_bound_row_once(view, monkeypatch):
+    view.list_view.scroll_to(FONT_COUNT // 2, Gtk.ListScrollFlags.NONE, None)
+    run_main_loop()
+
+    updates = []
+    monkeypatch.setattr(
+        FontRow, "update_preview", lambda row, *args: updates.append(row)
+    )
+    view.fonts_manager.filters.preview_size = 30
+
+    assert len(updates) == len(view.bound_rows)
+    assert set(updates) == view.bound_rows
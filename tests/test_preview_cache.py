@@ -0,0 +1,59 @@
+import shutil
+
+import pytest
+
+# the preview cache lives in the generator, which needs the generation deps
+generate_fonts_data = pytest.importorskip("generate_fonts_data", exc_type=ImportError)
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+
+def make_font(path):
+    pen = TTGlyphPen(None)
+    pen.moveTo((0, 0))
+    pen.lineTo((0, 500))
+    pen.lineTo((500, 0))
+    pen.closePath()
+
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder([".notdef", "A"])
+    builder.setupCharacterMap({ord("A"): "A"})
+    builder.setupGlyf({".notdef": TTGlyphPen(None).glyph(), "A": pen.glyph()})
+    builder.setupHorizontalMetrics({".notdef": (500, 0), "A": (500, 0)})
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({"familyName": "Sample", "styleName": "Regular"})
+    builder.setupOS2()
+    builder.setupPost()
+    builder.save(path)
+
+
+@pytest.fixture
+def preview_samples(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    metadata_path = tmp_path / "METADATA.pb"
+    metadata_path.write_text('name: "Sample"')
+    font_path = tmp_path / "Sample-Regular.ttf"
+    make_font(font_path)
+
+    build_key = generate_fonts_data.get_build_key(metadata_path, font_path, "A")
+    return [("Sample", font_path, "A", build_key)]
+
+
+def test_preview_names_come_from_the_inputs(preview_samples):
+    names = generate_fonts_data.generate_preview_files_incremental(preview_samples)
+    assert names == {"Sample": preview_samples[0][3][:32]}
+
+    # a missing cache, like an expired one in CI, gives the same names
+    shutil.rmtree(generate_fonts_data.BUILD_CACHE_PATH)
+    rebuilt = generate_fonts_data.generate_preview_files_incremental(preview_samples)
+    assert rebuilt == names
+
+
+def test_unchanged_previews_are_reused(preview_samples, monkeypatch):
+    generate_fonts_data.generate_preview_files_incremental(preview_samples)
+
+    def fail(*args):
+        raise AssertionError("rebuilt an unchanged preview")
+
+    monkeypatch.setattr(generate_fonts_data, "generate_subset", fail)
+    generate_fonts_data.generate_preview_files_incremental(preview_samples)
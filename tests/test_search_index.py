@@ -0,0 +1,134 @@
+import pytest
+
+from lipi.search_index import SearchIndex, bits_from_positions, iter_bits, normalize
+
+
+def make_record(family, designer, category, subsets, display_name=None):
+    return {
+        "family": family,
+        "display_name": display_name or family,
+        "designer": designer,
+        "license": "OFL",
+        "category": category,
+        "subsets": subsets,
+    }
+
+
+RECORDS = [
+    make_record("Inter", "Rasmus Andersson", ["Sans Serif"], ["latin", "greek"]),
+    make_record("Lora", "Cyreal", ["Serif"], ["latin", "cyrillic"]),
+    make_record(
+        "Noto Sans Hebrew",
+        "Google",
+        ["Sans Serif"],
+        ["hebrew", "latin"],
+        display_name="Noto Sans Hébrew",
+    ),
+    make_record(
+        "Fira Mono", "Carrois Apostrophe, Erik Spiekermann", ["Monospace"], ["latin"]
+    ),
+    make_record("Space Mono", "Colophon", ["Monospace"], ["latin", "vietnamese"]),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SearchIndex(RECORDS)
+
+
+def families(bits):
+    return sorted(RECORDS[pos]["family"] for pos in iter_bits(bits))
+
+
+def test_normalize_folds_case_and_accents():
+    assert normalize("Noto Sans Hébrew") == "noto sans hebrew"
+
+
+def test_bits_round_trip():
+    assert list(iter_bits(bits_from_positions(iter([0, 3, 64])))) == [0, 3, 64]
+
+
+def test_empty_query_matches_everything(index):
+    assert index.filter("", "All", "All") == index.all_bits
+    assert index.filter("  ", "All", "All") == index.all_bits
+
+
+def test_substring_of_names(index):
+    assert families(index.filter("mono", "All", "All")) == [
+        "Fira Mono",
+        "Space Mono",
+    ]
+    assert families(index.filter("hebrew", "All", "All")) == ["Noto Sans Hebrew"]
+    # short queries have no trigrams and fall back to the substring check
+    assert families(index.filter("lo", "All", "All")) == ["Lora"]
+
+
+def test_trigrams_are_confirmed_in_order(index):
+    assert index.filter("onom", "All", "All") == 0
+
+
+def test_designer_token_prefix(index):
+    assert families(index.filter("spiek", "All", "All")) == ["Fira Mono"]
+    assert families(index.filter("cyr", "All", "All")) == ["Lora"]
+
+
+def test_category_and_subset(index):
+    assert families(index.filter("", "Monospace", "All")) == [
+        "Fira Mono",
+        "Space Mono",
+    ]
+    assert families(index.filter("", "All", "cyrillic")) == ["Lora"]
+    assert families(index.filter("sans", "Sans Serif", "hebrew")) == [
+        "Noto Sans Hebrew"
+    ]
+    assert index.filter("", "Handwriting", "All") == 0
+
+
+def test_match_without_ranking_has_no_scores(index):
+    matches, scores = index.match("mono", "All", "All", False)
+    assert matches == index.filter("mono", "All", "All")
+    assert scores == {}
+
+
+def ranked(index, query, category="All", subset="All"):
+    matches, scores = index.match(query, category, subset, True)
+    positions = sorted(iter_bits(matches), key=lambda pos: (-scores[pos], pos))
+    return [RECORDS[pos]["family"] for pos in positions]
+
+
+def test_ranked_tolerates_one_typo(index):
+    # swapped letters, an extra letter and a missing letter
+    assert ranked(index, "lroa") == ["Lora"]
+    assert ranked(index, "interr") == ["Inter"]
+    assert ranked(index, "hebrw") == ["Noto Sans Hebrew"]
+
+
+def test_ranked_short_tokens_are_exact(index):
+    assert ranked(index, "lro") == []
+
+
+def test_ranked_prefix_and_initials(index):
+    assert ranked(index, "spa") == ["Space Mono"]
+    assert ranked(index, "nsh") == ["Noto Sans Hebrew"]
+
+
+def test_ranked_every_token_has_to_match(index):
+    assert ranked(index, "space mono") == ["Space Mono"]
+    assert ranked(index, "space lora") == []
+
+
+def test_ranked_searches_designer_and_license(index):
+    assert ranked(index, "andersson") == ["Inter"]
+    assert len(ranked(index, "ofl")) == len(RECORDS)
+
+
+def test_ranked_name_matches_come_first():
+    # "Cyreal" only matches Lora through its designer
+    records = RECORDS + [make_record("Cyreal Sans", "Someone", ["Sans Serif"], [])]
+    _, scores = SearchIndex(records).match("cyreal", "All", "All", True)
+    assert scores[len(RECORDS)] > scores[1]
+
+
+def test_ranked_respects_filters(index):
+    assert ranked(index, "mono", "Monospace") == ["Fira Mono", "Space Mono"]
+    assert ranked(index, "lora", "Sans Serif") == []